@@ -4,7 +4,7 @@ source /mnt/CORDEX_CMIP6_tmp/software/miniforge3/etc/profile.d/conda.sh
 env=catalog-update
 conda env list
 conda activate $env
-python code/catalog/catalog.py
+python code/catalog/catalog.py --incremental
 
 # Check if catalog.csv has changed
 git diff --quiet catalog.csv
@@ -12,7 +12,7 @@ changed=$?
 
 if [ $changed -ne 0 ]; then
   echo "committing changes!"
-  git add catalog.csv catalog.xlsx
+  git add catalog.csv catalog.xlsx catalog.changelog.json
   git commit --author="github-actions[bot] <github-actions[bot]@users.noreply.github.com>" -m "catalog update"
   git push origin main
 else
@@ -0,0 +1,440 @@
+"""
+Benchmark of the catalog build on synthetic DRS trees.
+
+This script generates CORDEX-CMIP5 and CORDEX-CMIP6 directory trees that match
+pattern_dict in catalog.py (empty or tiny NetCDF files) and times the catalog
+functions at different scales, so that performance regressions of the catalog job
+can be found without access to the real data.
+
+Functions:
+- synthetic_paths(project, nfiles): Yields DRS conform relative file paths.
+- make_tree(root, project, nfiles, size=0): Creates a synthetic DRS tree.
+- check_parser(project, paths): Compares the DRSParser fast path with the regex.
+- run_benchmark(root, project, nfiles, workdir, repeat=1): Times the catalog functions.
+- compare(results, history, tolerance): Compares results to the last run of another commit.
+
+The results (time, files/s and peak memory of each step) are appended to a json lines
+file together with the git commit, so runs of different commits can be compared, e.g.,
+
+    python code/catalog/benchmark.py --scales 10000 100000 --compare
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from os import path as op
+
+import pandas as pd
+
+from catalog import (
+    create_catalog,
+    create_excel,
+    get_parser,
+    human_readable,
+    parse_filepath,
+)
+
+institutions = [
+    ("CLMcom", "CCLM"),
+    ("GERICS", "REMO"),
+    ("DMI", "HCLIM"),
+    ("SMHI", "RCA"),
+    ("KNMI", "RACMO"),
+    ("IPSL", "WRF"),
+    ("CNRM", "ALADIN"),
+    ("ICTP", "RegCM"),
+    ("ETH", "COSMO"),
+    ("UQAM", "CRCM"),
+]
+driving = [
+    ("ECMWF", "ERA5"),
+    ("MPI-M", "MPI-ESM1-2-HR"),
+    ("EC-Earth-Consortium", "EC-Earth3-Veg"),
+    ("NCC", "NorESM2-MM"),
+]
+experiments = ["evaluation", "historical", "ssp370"]
+frequencies = ["mon", "day", "1hr"]
+variables = [
+    "tas",
+    "tasmax",
+    "tasmin",
+    "pr",
+    "psl",
+    "ps",
+    "huss",
+    "hurs",
+    "uas",
+    "vas",
+    "sfcWind",
+    "clt",
+    "rsds",
+    "rlds",
+    "rsus",
+    "rlus",
+    "evspsbl",
+    "mrso",
+    "snw",
+    "zg500",
+    "ta850",
+    "ua850",
+    "va850",
+    "hus850",
+    "cape",
+]
+versions = ["v20240101", "v20250101"]
+years = range(1971, 2001)
+
+
+def _time_range(frequency, year):
+    if frequency == "mon":
+        return f"{year}01-{year}12"
+    if frequency == "day":
+        return f"{year}0101-{year}1231"
+    return f"{year}01010030-{year}12312330"
+
+
+def synthetic_paths(project, nfiles):
+    """
+    Yields DRS conform relative file paths of a synthetic project.
+
+    The files are spread over institutions, driving models, experiments, source
+    versions, frequencies, variables, versions and years (in this order), so the
+    number of datasets grows with the number of files.
+
+    Parameters:
+    project (str): The project key in pattern_dict (CORDEX-CMIP5 or CORDEX-CMIP6).
+    nfiles (int): The number of files.
+
+    Yields:
+    str: The relative path of a file.
+    """
+    combinations = itertools.product(
+        institutions,
+        driving,
+        experiments,
+        ["v1", "v2"],
+        frequencies,
+        variables,
+        versions,
+        years,
+    )
+    for count, combination in enumerate(combinations):
+        if count == nfiles:
+            return
+        (
+            (institution, model),
+            (driver_institution, driver),
+            experiment,
+            realization,
+            frequency,
+            variable,
+            version,
+            year,
+        ) = combination
+        time_range = _time_range(frequency, year)
+        if project == "CORDEX-CMIP6":
+            source = f"{model}-{realization}"
+            member = "r1i1p1f1"
+            dirs = [
+                "CORDEX",
+                "DD",
+                "EUR-12",
+                institution,
+                driver,
+                experiment,
+                member,
+                source,
+                "v1",
+                frequency,
+                variable,
+                version,
+            ]
+            filename = (
+                f"{variable}_EUR-12_{driver}_{experiment}_{member}_{institution}_"
+                f"{source}_v1_{frequency}_{time_range}.nc"
+            )
+        else:
+            source = f"{model}{realization[1:]}"
+            member = "r1i1p1"
+            dirs = [
+                "CORDEX",
+                "output",
+                "EUR-11",
+                institution,
+                f"{driver_institution}-{driver}",
+                experiment,
+                member,
+                source,
+                "v1",
+                frequency,
+                variable,
+                version,
+            ]
+            filename = (
+                f"{variable}_EUR-11_{driver_institution}-{driver}_{experiment}_{member}_"
+                f"{institution}-{source}_v1_{frequency}_{time_range}.nc"
+            )
+        yield op.join(*dirs, filename)
+    raise ValueError(f"the synthetic {project} tree has less than {nfiles} files")
+
+
+def make_tree(root, project, nfiles, size=0):
+    """
+    Creates a synthetic DRS tree (if it does not exist yet).
+
+    Parameters:
+    root (str): The root directory of the tree.
+    project (str): The project key in pattern_dict.
+    nfiles (int): The number of files.
+    size (int): The size of each file in bytes (default: empty files).
+
+    Returns:
+    str: The root directory.
+    """
+    done = op.join(root, ".complete")
+    if op.isfile(done):
+        return root
+    content = b"\0" * size
+    current = None
+    for relpath in synthetic_paths(project, nfiles):
+        filename = op.join(root, relpath)
+        dirname = op.dirname(filename)
+        if dirname != current:
+            os.makedirs(dirname, exist_ok=True)
+            current = dirname
+        with open(filename, "wb") as f:
+            f.write(content)
+    open(done, "w").close()
+    return root
+
+
+def _measure(func, repeat):
+    # best wall time of several runs and the peak of traced allocations of one more run
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(seconds), peak
+
+
+def _variants(path):
+    # malformed variants of a path the fast path must reject like the regex
+    stem = path[:-3]
+    dirname, basename = op.split(path)
+    return [
+        "/" + path,
+        "//" + path,
+        "root//" + path,
+        path.replace("/", "//", 1),
+        op.join(dirname, "", basename),
+        stem + "_.nc",
+        stem.rpartition("_")[0] + "_.nc",
+        stem + "__.nc",
+        stem + ".tmp.nc",
+        "_" + path,
+        dirname + "/.nc",
+    ]
+
+
+def check_parser(project, paths):
+    """
+    Compares the split-based fast path of DRSParser with the regex.
+
+    Parameters:
+    project (str): The project key in pattern_dict.
+    paths (list): Well-formed file paths, malformed variants are added.
+
+    Returns:
+    list: The paths for which both give different results.
+    """
+    parser = get_parser(project)
+    mismatches = []
+    for path in itertools.chain(paths, *(_variants(p) for p in paths[:100])):
+        match = parser.regex.match(path)
+        expected = list(match.groups()) if match else None
+        if parser._match(path) != expected:
+            mismatches.append(path)
+    return mismatches
+
+
+def run_benchmark(root, project, nfiles, workdir, repeat=1):
+    """
+    Times the catalog functions on a synthetic tree.
+
+    Parameters:
+    root (str): The root directory of the tree.
+    project (str): The project key in pattern_dict.
+    nfiles (int): The number of files in the tree.
+    workdir (str): The directory for the CSV and Excel files.
+    repeat (int): The number of timed runs per step (the best one is reported).
+
+    Returns:
+    list: One record per step with seconds, files/s and peak memory in MB.
+    """
+    df = create_catalog(root, project)
+    paths = df["path"].tolist()
+    mismatches = check_parser(project, paths)
+    if mismatches:
+        raise AssertionError(f"fast path and regex differ for: {mismatches[:10]}")
+    csvfile = op.join(workdir, f"{project}-{nfiles}.csv")
+    df.to_csv(csvfile, index=False)
+    steps = {
+        "create_catalog": lambda: create_catalog(root, project),
+        "parse_filepath": lambda: [parse_filepath(p, project) for p in paths],
+        "human_readable": lambda: human_readable(df),
+        "create_excel": lambda: create_excel(csvfile),
+    }
+    records = []
+    for step, func in steps.items():
+        seconds, peak = _measure(func, repeat)
+        records.append(
+            {
+                "project": project,
+                "nfiles": nfiles,
+                "step": step,
+                "seconds": round(seconds, 4),
+                "files_per_s": round(len(paths) / seconds, 1),
+                "peak_mb": round(peak / 2**20, 2),
+            }
+        )
+    return records
+
+
+def git_commit():
+    """Returns the short hash of the current git commit (None outside of git)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=op.dirname(op.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(filename):
+    """Loads the results of previous runs."""
+    if not op.isfile(filename):
+        return pd.DataFrame()
+    return pd.read_json(filename, lines=True, dtype={"commit": str})
+
+
+def compare(results, history, tolerance=0.2):
+    """
+    Compares results to the last run of another commit.
+
+    Parameters:
+    results (pandas.DataFrame): The results of the current run.
+    history (pandas.DataFrame): The results of previous runs.
+    tolerance (float): The allowed relative slowdown.
+
+    Returns:
+    pandas.DataFrame: The results with the time and memory ratio to the baseline
+        and a regression flag.
+    """
+    keys = ["project", "nfiles", "step"]
+    if history.empty:
+        return results.assign(time_ratio=None, memory_ratio=None, regression=False)
+    history = history[history["commit"] != results["commit"].iloc[0]]
+    baseline = history.groupby(keys, as_index=False).last()
+    merged = results.merge(
+        baseline[keys + ["commit", "seconds", "peak_mb"]],
+        on=keys,
+        how="left",
+        suffixes=("", "_baseline"),
+    )
+    merged["time_ratio"] = (merged["seconds"] / merged["seconds_baseline"]).round(2)
+    merged["memory_ratio"] = (merged["peak_mb"] / merged["peak_mb_baseline"]).round(2)
+    merged["regression"] = (merged["time_ratio"] > 1 + tolerance) | (
+        merged["memory_ratio"] > 1 + tolerance
+    )
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the catalog build on synthetic DRS trees."
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 1_000_000],
+        help="numbers of files (default: 10000 100000 1000000)",
+    )
+    parser.add_argument(
+        "--projects",
+        nargs="+",
+        default=["CORDEX-CMIP6", "CORDEX-CMIP5"],
+        help="projects to benchmark (default: CORDEX-CMIP6 CORDEX-CMIP5)",
+    )
+    parser.add_argument(
+        "--workdir",
+        default=op.join(os.environ.get("TMPDIR", "/tmp"), "catalog-benchmark"),
+        help="directory for the synthetic trees, they are reused by later runs",
+    )
+    parser.add_argument(
+        "--size", type=int, default=0, help="size of the synthetic files in bytes"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="timed runs per step (default: 1)"
+    )
+    parser.add_argument(
+        "--results",
+        default="benchmark.jsonl",
+        help="json lines file the results are appended to (default: benchmark.jsonl)",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="compare to the last run of another commit and fail on regressions",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed relative slowdown or memory growth (default: 0.2)",
+    )
+    args = parser.parse_args()
+
+    history = load_history(args.results)
+    records = []
+    for project in args.projects:
+        for nfiles in args.scales:
+            root = make_tree(
+                op.join(args.workdir, f"{project}-{nfiles}"), project, nfiles, args.size
+            )
+            records.extend(
+                run_benchmark(root, project, nfiles, args.workdir, args.repeat)
+            )
+    results = pd.DataFrame(records)
+    results.insert(0, "commit", git_commit())
+    results.insert(1, "date", datetime.now(timezone.utc).isoformat(timespec="seconds"))
+    results.insert(2, "python", sys.version.split()[0])
+    results.insert(3, "pandas", pd.__version__)
+    with open(args.results, "a") as f:
+        for record in results.to_dict(orient="records"):
+            f.write(json.dumps(record) + "\n")
+
+    if args.compare:
+        results = compare(results, history, args.tolerance)
+    print(results.drop(columns=["date", "python", "pandas"]).to_string(index=False))
+    if args.compare and results["regression"].any():
+        sys.exit(1)
@@ -9,10 +9,31 @@ Functions:
 - human_readable(df): Creates a human-readable summary of the dataset.
 - create_excel(filename): Creates a human-readable Excel file from the dataset.
 - update_catalog(catalog, root): Updates the catalog with metadata from the specified root directory.
+- scan_directory(root, state): Lists all NetCDF files below root, reusing the listing of unchanged directories.
+- update_catalogs(catalog, roots): Scans several root directories concurrently with a bounded worker pool.
+- write_parquet(df, catalog): Writes a columnar companion of the catalog with categorical facets.
+- catalog_source(catalog): Returns the file to load the catalog from (columnar companion or CSV).
+- load_catalog(catalog, columns): Loads (a projection of) the catalog, preferring the columnar companion.
+- harvest_headers(df, cache): Adds NetCDF header information (shape, dtype, chunking, ...) to the catalog.
+- diff_catalogs(old, new, attrs=None): Compares two catalogs by the datasets of the intake-esm collection.
+- write_catalog(df, catalog): Writes catalog, companion and Excel file, skipped if the content hash is unchanged.
+
+The catalog can be rebuilt incrementally (``--incremental``): the scan state (directory mtimes,
+file sizes and inodes) is kept next to the catalog and only new or changed files are parsed again.
+The CSV file stays the source of truth, the Parquet file is only a faster way to load it.
 """
 
+import argparse
+import contextlib
+import functools
+import hashlib
+import importlib.util
+import json
+import multiprocessing as mp
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 from os import path as op
 
@@ -28,6 +49,22 @@ pattern_dict = {
 
 CATALOG = "catalog.csv"
 
+# intake-esm collection, defines how catalog rows are grouped into datasets
+ESMCAT = op.join(op.dirname(op.abspath(__file__)), "..", "..", "CORDEX-CMIP6.json")
+
+# columns added by the (optional) header harvest
+HEADER_COLS = [
+    "dims",
+    "shape",
+    "dtype",
+    "chunks",
+    "compression",
+    "nbytes",
+    "time_start",
+    "time_end",
+    "filesize",
+]
+
 COLS = [
     "project_id",
     "mip_era",
@@ -80,83 +117,560 @@ def translate_attrs_to_CMIP6(attrs):
     return translated_attrs
 
 
-def parse_filepath(filename, project):
-    # pattern = create_pattern(drs)
-    regex = pattern_dict[project]
-    mip_era = project.split("-")[1]
-    regex = r"^/?(?:[^/]+/)*" + regex
-    pattern = re.compile(regex)
-    match = pattern.match(filename)
-    if not match:
-        print(f"Error: Parsing failed for: {filename}")
-        return {}
-    attrs = match.groupdict() | {"mip_era": mip_era}
-    if match:
-        inconsistencies = check_for_inconsistency(attrs)
-        if inconsistencies:
+def _split_pattern(regex, sep):
+    """Splits a regex at a separator outside of groups and character classes."""
+    parts = [""]
+    depth = 0
+    in_class = False
+    escaped = False
+    for c in regex:
+        if escaped:
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        elif c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "(" and not in_class:
+            depth += 1
+        elif c == ")" and not in_class:
+            depth -= 1
+        elif c == sep and not in_class and depth == 0:
+            parts.append("")
+            continue
+        parts[-1] += c
+    return parts
+
+
+def _group_names(regex):
+    return re.findall(r"\(\?P<(\w+)>", regex)
+
+
+class DRSParser:
+    """
+    Parses file paths according to the DRS of a project in pattern_dict.
+
+    The regular expression is compiled only once. Well-formed paths are parsed by
+    splitting at the path and filename separators, the regular expression is used
+    as a fallback for all other paths. Both give identical results.
+    """
+
+    filename_suffix = r"(?:_(?P<time_range>[^.]+))?\.nc)"
+
+    def __init__(self, project):
+        self.project = project
+        self.mip_era = project.split("-")[1]
+        self.regex = re.compile(r"^/?(?:[^/]+/)*" + pattern_dict[project])
+        self.names = list(self.regex.groupindex)
+        self.columns = self.names + ["mip_era"]
+        if self.mip_era == "CMIP5":
+            self.columns = [attrs_mapping.get(name, name) for name in self.columns]
+        self.dir_layout, self.file_layout = self._layout(pattern_dict[project])
+        if self.dir_layout is not None:
+            # components that hold two facets joined by "-"
+            self.dir_pairs = [i for i, n in enumerate(self.dir_layout) if len(n) == 2]
+            self.file_pairs = [i for i, n in enumerate(self.file_layout) if len(n) == 2]
+
+    def _layout(self, regex):
+        # group names per directory level and per filename segment, each level
+        # or segment holds either one facet or two facets joined by "-"
+        *dirs, filename = _split_pattern(regex, "/")
+        prefix = "(?P<filename>"
+        if not filename.startswith(prefix) or not filename.endswith(
+            self.filename_suffix
+        ):
+            return None, None
+        segments = _split_pattern(
+            filename[len(prefix) : -len(self.filename_suffix)], "_"
+        )
+        dir_layout = [_group_names(d) for d in dirs]
+        file_layout = [_group_names(seg) for seg in segments]
+        flat = [name for names in dir_layout for name in names]
+        flat += ["filename"] + [name for names in file_layout for name in names]
+        if flat + ["time_range"] != self.names or not all(
+            len(names) in (1, 2) for names in dir_layout + file_layout
+        ):
+            return None, None
+        return dir_layout, file_layout
+
+    def _split(self, filename):
+        """Fast path, returns the group values or None if the regex is required."""
+        if self.dir_layout is None:
+            return None
+        parts = filename.split("/")
+        ndirs = len(self.dir_layout)
+        # the regex allows a leading "/" but no empty components
+        if len(parts) < ndirs + 1 or "" in parts[1:]:
+            return None
+        basename = parts[-1]
+        stem = basename[:-3]
+        if not basename.endswith(".nc") or "." in stem:
+            return None
+        segments = stem.split("_")
+        if len(segments) == len(self.file_layout):
+            time_range = None
+        elif len(segments) == len(self.file_layout) + 1 and segments[-1]:
+            time_range = segments.pop()
+        else:
+            return None
+        dirs = self._split_components(parts[-ndirs - 1 : -1], self.dir_pairs)
+        segments = self._split_components(segments, self.file_pairs)
+        if dirs is None or segments is None:
+            return None
+        return dirs + [basename] + segments + [time_range]
+
+    @staticmethod
+    def _split_components(comps, pairs):
+        if "" in comps:
+            return None
+        for i in reversed(pairs):
+            # the regex splits at the last "-", the first part contains no "_"
+            left, _, right = comps[i].rpartition("-")
+            if not left or not right or "_" in left:
+                return None
+            comps[i : i + 1] = [left, right]
+        return comps
+
+    def _match(self, filename):
+        values = self._split(filename)
+        if values is not None:
+            return values
+        match = self.regex.match(filename)
+        if not match:
+            return None
+        return list(match.groups())
+
+    def parse(self, filename):
+        """
+        Parses a single file path.
+
+        Parameters:
+        filename (str): The file path.
+
+        Returns:
+        dict: The parsed attributes (empty if parsing failed).
+        """
+        columns = self.parse_batch([filename])
+        if not columns["path"]:
+            return {}
+        attrs = {key: values[0] for key, values in columns.items()}
+        del attrs["path"]
+        return attrs
+
+    def parse_batch(self, filenames):
+        """
+        Parses a list of file paths.
+
+        Parameters:
+        filenames (list): The file paths.
+
+        Returns:
+        dict: The parsed attributes as columns (lists) including a path column,
+            paths that could not be parsed are left out.
+        """
+        rows = []
+        paths = []
+        for filename in filenames:
+            values = self._match(filename)
+            if values is None:
+                print(f"Error: Parsing failed for: {filename}")
+                continue
+            rows.append(values)
+            paths.append(filename)
+        columns = dict(zip(self.names, map(list, zip(*rows))))
+        if not rows:
+            columns = {name: [] for name in self.names}
+        self._check_consistency(columns, paths)
+        columns["mip_era"] = [self.mip_era] * len(paths)
+        if self.mip_era == "CMIP5":
+            columns = {attrs_mapping.get(k, k): v for k, v in columns.items()}
+        columns["path"] = paths
+        return columns
+
+    def _check_consistency(self, columns, paths):
+        inconsistent = {}
+        for k in self.names:
+            if not k.endswith("_2"):
+                continue
+            values = np.array(columns[k], dtype=object)
+            mask = values != np.array(columns[k[:-2]], dtype=object)
+            for i in np.flatnonzero(mask):
+                print(f"Warning: {k} ({values[i]}) != {k[:-2]} ({columns[k[:-2]][i]})")
+                inconsistent.setdefault(i, []).append(k)
+        for i, keys in sorted(inconsistent.items()):
             print(
-                f"Warning: parsing returns inconsistent attributes: {inconsistencies}, will use the first occurrence of each attribute."
+                f"Warning: parsing returns inconsistent attributes: {keys}, will use the first occurrence of each attribute."
             )
-            print(f"Please check: {filename}")
-            # return {}
+            print(f"Please check: {paths[i]}")
+
+
+parsers = {}
+
+
+def get_parser(project):
+    """Returns the (cached) DRSParser of a project."""
+    if project not in parsers:
+        parsers[project] = DRSParser(project)
+    return parsers[project]
+
+
+def parse_filepath(filename, project):
+    return get_parser(project).parse(filename)
+
+
+def drs_depth(project, facet):
+    """
+    Returns the directory level of a facet in the DRS of a project.
+
+    Parameters:
+    project (str): The project key in pattern_dict.
+    facet (str): The CMIP6 facet name, e.g. institution_id or source_id.
+
+    Returns:
+    int: The directory level (0 for the project_id directory).
+    """
+    name = facet
+    if project.split("-")[1] == "CMIP5":
+        name = {v: k for k, v in attrs_mapping.items()}.get(facet, facet)
+    dirs = _split_pattern(pattern_dict[project], "/")
+    return next(i for i, d in enumerate(dirs) if f"(?P<{name}>" in d)
+
+
+def _file_stat(entry):
+    try:
+        st = entry.stat()
+    except OSError:
+        # broken symlink
+        st = entry.stat(follow_symlinks=False)
+    return [st.st_size, st.st_ino]
+
+
+def _list_directory(dirpath, old_state):
+    """Lists a single directory, the cached listing is used if its mtime did not change."""
+    try:
+        mtime = os.stat(dirpath).st_mtime_ns
+    except OSError as e:
+        print(f"Error: cannot access {dirpath}: {e}")
+        return None, []
+    cached = old_state.get(dirpath)
+    if cached and cached["mtime"] == mtime:
+        entry = cached
     else:
-        print(
-            f"The filepath does not match the expected pattern (will be ignored): {filename}"
-        )
-        return {}
-    if mip_era == "CMIP5":
-        attrs = translate_attrs_to_CMIP6(attrs)
-    return attrs
+        dirs = []
+        files = {}
+        with os.scandir(dirpath) as it:
+            for item in it:
+                if item.is_dir():
+                    # same as os.walk, symlinked directories are not followed
+                    if not item.is_symlink():
+                        dirs.append(item.name)
+                elif ".nc" in item.name:
+                    files[item.name] = _file_stat(item)
+        entry = {"mtime": mtime, "dirs": sorted(dirs), "files": files}
+    old_files = cached["files"] if cached else {}
+    found = [
+        (op.join(dirpath, file), old_files.get(file) != entry["files"][file])
+        for file in sorted(entry["files"])
+    ]
+    return entry, found
+
+
+def _walk(top, old_state, new_state):
+    found = []
+    stack = [top]
+    while stack:
+        dirpath = stack.pop()
+        entry, files = _list_directory(dirpath, old_state)
+        if entry is None:
+            continue
+        new_state[dirpath] = entry
+        found.extend(files)
+        stack.extend(op.join(dirpath, d) for d in reversed(entry["dirs"]))
+    return found
+
+
+def _parallel_walk(root, old_state, new_state, executor, split_depth):
+    # list the upper DRS levels breadth first, all directories of a level concurrently
+    listings = {}
+    level = [root]
+    for depth in range(split_depth):
+        results = list(executor.map(lambda d: _list_directory(d, old_state), level))
+        next_level = []
+        for dirpath, (entry, files) in zip(level, results):
+            if entry is None:
+                continue
+            new_state[dirpath] = entry
+            listings[dirpath] = files
+            next_level.extend(op.join(dirpath, d) for d in entry["dirs"])
+        level = next_level
+    # scan the subtrees below the split level concurrently
+    subtrees = {}
+    for dirpath in level:
+        subtree_state = {}
+        future = executor.submit(_walk, dirpath, old_state, subtree_state)
+        subtrees[dirpath] = (future, subtree_state)
+    # assemble in the same order as the serial walk
+    found = []
+    stack = [root]
+    while stack:
+        dirpath = stack.pop()
+        if dirpath in subtrees:
+            future, subtree_state = subtrees[dirpath]
+            found.extend(future.result())
+            new_state.update(subtree_state)
+        elif dirpath in listings:
+            found.extend(listings[dirpath])
+            dirs = new_state[dirpath]["dirs"]
+            stack.extend(op.join(dirpath, d) for d in reversed(dirs))
+    return found
+
+
+def scan_directory(root, state=None, executor=None, split_depth=None):
+    """
+    Lists all NetCDF files below root in sorted order.
 
+    Directories whose mtime did not change since the last scan are not listed again,
+    their content is taken from the scan state instead. If an executor is given, the
+    directories down to split_depth are listed level by level and the subtrees below
+    are scanned concurrently, the result does not depend on the number of workers.
 
-def create_catalog(root, project):
-    datasets = []
-    # Define the regex pattern for the filename
-    for root, dirs, files in os.walk(root):
-        # only parse if files found
-        if not files:
+    Parameters:
+    root (str): The root directory to scan.
+    state (dict): The scan state of a previous run (will be updated in place).
+    executor (concurrent.futures.Executor): The worker pool for a concurrent scan.
+    split_depth (int): The directory depth below root at which the scan fans out.
+
+    Returns:
+    list: Tuples of (path, changed) for all files, changed is True for new or modified files.
+    """
+    if state is None:
+        state = {}
+    old_state = dict(state)
+    state.clear()
+    if executor is None or not split_depth:
+        return _walk(root, old_state, state)
+    return _parallel_walk(root, old_state, state, executor, split_depth)
+
+
+def read_header(filename, variable_id):
+    """
+    Reads the header of a NetCDF file, the data itself is not read.
+
+    Only the first and last value of the time coordinate are read to get
+    the actual time span of the file.
+
+    Parameters:
+    filename (str): The path to the NetCDF file.
+    variable_id (str): The name of the data variable.
+
+    Returns:
+    dict: The header information (see HEADER_COLS), empty if the file can not be read.
+    """
+    import netCDF4
+
+    header = {}
+    try:
+        with netCDF4.Dataset(filename) as nc:
+            var = nc.variables[variable_id]
+            chunking = var.chunking()
+            filters = var.filters() or {}
+            compression = [
+                k for k, v in filters.items() if v and k not in ("complevel", "shuffle")
+            ]
+            if compression and filters.get("complevel"):
+                compression.append(str(filters["complevel"]))
+            header = {
+                "dims": ",".join(var.dimensions),
+                "shape": ",".join(map(str, var.shape)),
+                "dtype": str(var.dtype),
+                "chunks": (
+                    chunking
+                    if isinstance(chunking, str)
+                    else ",".join(map(str, chunking))
+                ),
+                "compression": ":".join(compression),
+                "nbytes": int(var.size * var.dtype.itemsize),
+            }
+            if "time" in nc.variables and nc.variables["time"].size > 0:
+                time = nc.variables["time"]
+                values = netCDF4.num2date(
+                    [time[0], time[-1]],
+                    time.units,
+                    calendar=getattr(time, "calendar", "standard"),
+                )
+                header["time_start"] = values[0].isoformat()
+                header["time_end"] = values[-1].isoformat()
+    except (OSError, KeyError, AttributeError, ValueError) as e:
+        print(f"Error: Reading header failed for: {filename} ({e})")
+    return header
+
+
+def _read_headers(filenames, variable_ids):
+    return [read_header(f, v) for f, v in zip(filenames, variable_ids)]
+
+
+def harvest_headers(df, cache, executor=None, batchsize=64):
+    """
+    Adds NetCDF header information (HEADER_COLS) to the catalog entries.
+
+    Headers are cached per path, size and mtime of the file, only new or
+    modified files are opened.
+
+    Parameters:
+    df (pandas.DataFrame): The catalog entries.
+    cache (dict): The header cache (will be updated in place).
+    executor (concurrent.futures.Executor): The process pool for reading headers.
+    batchsize (int): The number of files read per task.
+
+    Returns:
+    pandas.DataFrame: The catalog entries with header columns.
+    """
+    records = []
+    todo = []
+    for i, path in enumerate(df["path"]):
+        try:
+            st = os.stat(path)
+        except OSError:
+            records.append({})
             continue
-        for file in files:
-            if ".nc" in file:
-                filename = op.join(root, file)
-                print(f"parsing {filename}")
-                metadata = parse_filepath(filename, project)
-                if metadata:
-                    metadata["path"] = filename
-                    datasets.append(metadata)
-    return datasets
+        key = [st.st_size, st.st_mtime_ns]
+        cached = cache.get(path)
+        if cached and cached["key"] == key:
+            records.append(cached["header"])
+        else:
+            records.append(None)
+            todo.append((i, key))
+    if todo:
+        print(f"reading {len(todo)} headers")
+        paths = [df["path"].iat[i] for i, _ in todo]
+        variable_ids = [df["variable_id"].iat[i] for i, _ in todo]
+        batches = [
+            (paths[n : n + batchsize], variable_ids[n : n + batchsize])
+            for n in range(0, len(todo), batchsize)
+        ]
+        map_ = executor.map if executor is not None else map
+        headers = [h for batch in map_(_read_headers, *zip(*batches)) for h in batch]
+        for (i, key), header in zip(todo, headers):
+            records[i] = header
+            cache[df["path"].iat[i]] = {"key": key, "header": header}
+    headers = pd.DataFrame.from_records(records, columns=HEADER_COLS)
+    headers["filesize"] = [
+        cache[p]["key"][0] if p in cache else None for p in df["path"]
+    ]
+    return pd.concat([df.reset_index(drop=True), headers], axis=1)
+
+
+def create_catalog(
+    root,
+    project,
+    state=None,
+    previous=None,
+    executor=None,
+    split_facet="source_id",
+    headers=None,
+    process_pool=None,
+):
+    """
+    Creates catalog entries for all NetCDF files below root.
+
+    Parameters:
+    root (str): The root directory to scan.
+    project (str): The project key in pattern_dict.
+    state (dict): The scan state of a previous run (will be updated in place).
+    previous (pandas.DataFrame): Catalog entries of a previous run indexed by path,
+        these are reused for unchanged files.
+    executor (concurrent.futures.Executor): The worker pool for a concurrent scan.
+    split_facet (str): The DRS facet at which a concurrent scan fans out, the root
+        is expected to contain the project_id directories.
+    headers (dict): If given, NetCDF headers are harvested using this cache
+        (will be updated in place), see harvest_headers.
+    process_pool (concurrent.futures.Executor): The process pool for reading headers.
+
+    Returns:
+    pandas.DataFrame: The catalog entries in the order of the directory scan.
+    """
+    split_depth = drs_depth(project, split_facet) + 1
+    files = scan_directory(root, state, executor=executor, split_depth=split_depth)
+    if previous is None:
+        previous = read_previous(None)
+    reuse = [f for f, changed in files if not changed and f in previous.index]
+    reuse_set = set(reuse)
+    new = [f for f, _ in files if f not in reuse_set]
+    parsed = pd.DataFrame(get_parser(project).parse_batch(new))
+    print(
+        f"{project}: parsed {len(new)} new or changed files of {len(files)} in {root}"
+    )
+    df = pd.concat(
+        [d[COLS + ["path"]] for d in (previous.loc[reuse], parsed) if not d.empty],
+        ignore_index=True,
+    )
+    if df.empty:
+        df = pd.DataFrame(columns=COLS + ["path"])
+    else:
+        order = {f: i for i, (f, _) in enumerate(files)}
+        df = df.iloc[df["path"].map(order).argsort(kind="stable")]
+        df = df.reset_index(drop=True)
+    if headers is not None:
+        df = harvest_headers(df, headers, executor=process_pool)
+    return df
 
 
-def human_readable(df):
+def human_readable(df, cache=None):
     """
     Creates a human-readable summary of the dataset.
 
     Parameters:
     df (pandas.DataFrame): The input DataFrame containing the dataset.
+    cache (dict): Sheet rows of a previous run keyed by group (will be updated in place),
+        only the rows of groups whose content changed are recomputed.
 
     Returns:
     pandas.DataFrame: A DataFrame with grouped and summarized data.
     """
     cols = [item for item in COLS if item not in ["variable_id", "time_range"]]
+    df = df[cols + ["variable_id"]].dropna(subset=cols).drop_duplicates()
+    if cache is None:
+        return df.groupby(cols)["variable_id"].agg(list).to_frame()
+    # order sensitive digest of the variables in each group
+    codes, keys = pd.factorize(pd.util.hash_pandas_object(df[cols], index=False))
+    # (rank, variable) pairs are hashed together, so moving a variable changes the digest
+    rank = df.groupby(cols, sort=False).cumcount().to_numpy()
+    pairs = pd.DataFrame({"rank": rank, "variable_id": df["variable_id"].to_numpy()})
+    values = pd.util.hash_pandas_object(pairs, index=False).to_numpy()
+    digests = np.zeros(len(keys), dtype=np.uint64)
+    np.add.at(digests, codes, values)
+    keys = [format(k, "x") for k in keys]
+    digests = [format(d, "x") for d in digests]
+    changed = np.array(
+        [cache.get(k, [None])[0] != d for k, d in zip(keys, digests)], dtype=bool
+    )
+    mask = changed[codes]
+    lists = df["variable_id"][mask].groupby(codes[mask], sort=False).agg(list)
+    for code, variables in lists.items():
+        cache[keys[code]] = [digests[code], variables]
+    for key in set(cache) - set(keys):
+        del cache[key]
+    print(f"recomputed {changed.sum()} of {len(keys)} sheet rows")
+    _, first = np.unique(codes, return_index=True)
+    index = pd.MultiIndex.from_frame(df[cols].iloc[first])
+    sheet = pd.DataFrame({"variable_id": [cache[k][1] for k in keys]}, index=index)
+    return sheet.sort_index()
 
-    def to_list(x):
-        return list(dict.fromkeys(list(x)))
 
-    return df.groupby(cols)["variable_id"].apply(to_list).to_frame()  # .reset_index()
-
-
-def create_excel(filename):
+def create_excel(filename, cache=None):
     """
     Creates a human-readable Excel file from the dataset.
 
     Parameters:
     filename (str): The path to the CSV file containing the dataset.
+    cache (dict): Sheet rows of a previous run, see human_readable.
 
     Returns:
     str: The path to the created Excel file.
     """
     df = pd.read_csv(filename)
-    sheets = {"jsc-cordex": human_readable(df)}
+    sheets = {"jsc-cordex": human_readable(df, cache=cache)}
 
     stem, suffix = op.splitext(filename)
     xlsxfile = f"{stem}.xlsx"
@@ -171,7 +685,10 @@ def create_excel(filename):
             for idx, col in enumerate(sheet_df.columns):
                 max_len = (
                     max(
-                        sheet_df[col].astype(str).map(len).max(),  # len of largest item
+                        sheet_df[col]
+                        .astype(str)
+                        .str.len()
+                        .max(),  # len of largest item
                         len(str(col)),  # len of column name/header
                     )
                     + 2
@@ -187,8 +704,9 @@ def create_excel(filename):
                 max_len = (
                     max(
                         sheet_df.index.get_level_values(level)
+                        .unique()
                         .astype(str)
-                        .map(len)
+                        .str.len()
                         .max(),  # len of largest item in index level
                         len(str(level)),  # len of index level name
                     )
@@ -199,29 +717,491 @@ def create_excel(filename):
     return xlsxfile
 
 
-def update_catalog(catalog, root, project):
+def parquet_file(catalog):
+    """Returns the path of the columnar companion that belongs to a catalog."""
+    return _companion(catalog, ".parquet")
+
+
+def write_parquet(df, catalog):
+    """
+    Writes the columnar companion of the catalog.
+
+    The facet columns (COLS) are stored as categoricals, so they can be loaded
+    with a fraction of the memory of the CSV file.
+
+    Parameters:
+    df (pandas.DataFrame): The catalog DataFrame.
+    catalog (str): The path to the catalog CSV file.
+
+    Returns:
+    str: The path to the created Parquet file.
+    """
+    filename = parquet_file(catalog)
+    df = df.reset_index(drop=True).astype({col: "category" for col in COLS})
+    df.to_parquet(filename, index=False)
+    return filename
+
+
+@functools.lru_cache(maxsize=8)
+def _load_catalog(filename, mtime, columns):
+    if filename.endswith(".parquet"):
+        return pd.read_parquet(filename, columns=columns)
+    dtype = {col: "category" for col in COLS}
+    return pd.read_csv(filename, usecols=columns, dtype=dtype)
+
+
+@functools.lru_cache(maxsize=None)
+def parquet_engine():
+    """Returns True if pandas can read and write Parquet files (pyarrow or fastparquet)."""
+    return any(importlib.util.find_spec(m) for m in ["pyarrow", "fastparquet"])
+
+
+def catalog_source(catalog=CATALOG):
+    """
+    Returns the file to load a catalog from.
+
+    This is the columnar companion if it is at least as recent as the CSV file
+    and a Parquet engine is installed, otherwise the CSV file.
+
+    Parameters:
+    catalog (str): The path to the catalog CSV file.
+
+    Returns:
+    str: The path to the Parquet or CSV file.
+    """
+    parquet = parquet_file(catalog)
+    if not parquet_engine():
+        return catalog
+    if op.isfile(parquet) and (
+        not op.isfile(catalog) or os.stat(parquet).st_mtime >= os.stat(catalog).st_mtime
+    ):
+        return parquet
+    return catalog
+
+
+def load_catalog(catalog=CATALOG, columns=None):
+    """
+    Loads the catalog, reading only the requested columns.
+
+    The columnar companion is used if it is up to date (see catalog_source),
+    otherwise it is regenerated from the CSV file (if the directory is writable and
+    a Parquet engine is installed).
+    Facet columns are categoricals in both cases.
+    Results are cached per file and modification time, the returned DataFrame is
+    shared and must not be modified in place.
+
+    Parameters:
+    catalog (str): The path to the catalog CSV file.
+    columns (list): The columns to load (default: all columns).
+
+    Returns:
+    pandas.DataFrame: The catalog DataFrame.
+    """
+    filename = catalog_source(catalog)
+    if filename == catalog and parquet_engine():
+        # the companion is not tracked in git, it is rebuilt by the first reader
+        with contextlib.suppress(OSError):
+            filename = write_parquet(pd.read_csv(catalog), catalog)
+    columns = tuple(columns) if columns is not None else None
+    return _load_catalog(filename, os.stat(filename).st_mtime_ns, columns)
+
+
+def _companion(catalog, suffix):
+    stem, _ = op.splitext(catalog)
+    return f"{stem}{suffix}"
+
+
+def _load_json(filename):
+    if not op.isfile(filename):
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def _save_json(filename, obj):
+    tmpfile = f"{filename}.tmp"
+    with open(tmpfile, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmpfile, filename)
+
+
+def state_file(catalog):
+    """Returns the path of the scan state file that belongs to a catalog."""
+    return _companion(catalog, ".state.json")
+
+
+def load_state(catalog):
+    """
+    Loads the scan state stored next to the catalog.
+
+    Parameters:
+    catalog (str): The path to the catalog CSV file.
+
+    Returns:
+    dict: The scan state per root directory (empty if there is none).
+    """
+    return _load_json(state_file(catalog))
+
+
+def save_state(catalog, state):
+    """Writes the scan state next to the catalog."""
+    _save_json(state_file(catalog), state)
+
+
+def headers_file(catalog):
+    """Returns the path of the header cache that belongs to a catalog."""
+    return _companion(catalog, ".headers.json")
+
+
+def load_headers(catalog):
+    """Loads the header cache stored next to the catalog (empty if there is none)."""
+    return _load_json(headers_file(catalog))
+
+
+def save_headers(catalog, headers):
+    """Writes the header cache next to the catalog."""
+    _save_json(headers_file(catalog), headers)
+
+
+def hash_file(catalog):
+    """Returns the path of the content hash file that belongs to a catalog."""
+    return _companion(catalog, ".hash.json")
+
+
+def changelog_file(catalog):
+    """Returns the path of the changelog that belongs to a catalog."""
+    return _companion(catalog, ".changelog.json")
+
+
+def canonical_order(df):
+    """Sorts the catalog by path, so the output does not depend on the scan order."""
+    return df.sort_values("path", kind="stable", ignore_index=True)
+
+
+def catalog_digest(df):
+    """
+    Computes a content hash of the catalog rows.
+
+    Parameters:
+    df (pandas.DataFrame): The catalog DataFrame (in canonical order).
+
+    Returns:
+    str: The hex digest.
+    """
+    rows = pd.util.hash_pandas_object(df.fillna("").astype(str), index=False)
+    digest = hashlib.sha256(",".join(df.columns).encode())
+    digest.update(rows.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _file_key(filename):
+    if not op.isfile(filename):
+        return None
+    st = os.stat(filename)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def groupby_attrs(esmcat=ESMCAT):
+    """Returns the attributes that define a dataset in the intake-esm collection."""
+    with open(esmcat) as f:
+        return json.load(f)["aggregation_control"]["groupby_attrs"]
+
+
+def _dataset_digests(df, attrs):
+    # hashed dataset keys and an order independent digest of the rows of each dataset
+    keys = pd.util.hash_pandas_object(df[attrs], index=False).to_numpy()
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    codes, uniques = pd.factorize(keys)
+    digests = np.zeros(len(uniques), dtype=np.uint64)
+    np.add.at(digests, codes, rows)
+    return keys, pd.Series(digests, index=uniques)
+
+
+def _describe(df, keys, selected, attrs):
+    # facets and variables of the selected datasets
+    df = df[np.isin(keys, selected)]
+    result = []
+    for _, group in df.groupby(attrs, sort=True):
+        entry = {"key": ".".join(group[attrs].iloc[0])}
+        entry.update(group[attrs].iloc[0].to_dict())
+        entry["variables"] = sorted(group["variable_id"].unique())
+        result.append(entry)
+    return result
+
+
+def _changed_rows(old, new, columns):
+    # rows that only exist in one snapshot, grouped by dataset key and side
+    rows = pd.merge(
+        old[columns].drop_duplicates(),
+        new[columns].drop_duplicates(),
+        how="outer",
+        indicator=True,
+    )
+    rows = rows[rows["_merge"] != "both"]
+    return dict(list(rows.groupby(["_key", "_merge"], observed=True)))
+
+
+def diff_catalogs(old, new, attrs=None):
+    """
+    Compares two catalog snapshots dataset by dataset.
+
+    Datasets are identified by the groupby_attrs of the intake-esm collection,
+    added, removed and modified datasets are found by set operations on hashed
+    keys and per dataset digests, only modified datasets are compared row by row.
+
+    Parameters:
+    old (pandas.DataFrame): The previous catalog.
+    new (pandas.DataFrame): The current catalog.
+    attrs (list): The attributes that define a dataset (default: groupby_attrs()).
+
+    Returns:
+    dict: The changelog with added, removed, modified and superseded datasets.
+    """
+    if attrs is None:
+        attrs = groupby_attrs()
+    columns = [col for col in new.columns if col in old.columns]
+    old = old[columns].fillna("").astype(str)
+    new = new[columns].fillna("").astype(str)
+    old_keys, old_digests = _dataset_digests(old, attrs)
+    new_keys, new_digests = _dataset_digests(new, attrs)
+    added = new_digests.index.difference(old_digests.index)
+    removed = old_digests.index.difference(new_digests.index)
+    common = new_digests.index.intersection(old_digests.index)
+    modified = common[new_digests[common].to_numpy() != old_digests[common].to_numpy()]
+
+    changelog = {
+        "groupby_attrs": attrs,
+        "datasets": {"old": len(old_digests), "new": len(new_digests)},
+        "added": _describe(new, new_keys, added, attrs),
+        "removed": _describe(old, old_keys, removed, attrs),
+        "modified": [],
+        "superseded": [],
+    }
+
+    # row level changes of modified datasets
+    old = old.assign(_key=old_keys)[np.isin(old_keys, modified)]
+    new = new.assign(_key=new_keys)[np.isin(new_keys, modified)]
+    variables = _changed_rows(old, new, ["_key", "variable_id"])
+    ranges = _changed_rows(old, new, ["_key", "variable_id", "time_range"])
+    paths = _changed_rows(old, new, ["_key", "path"])
+    unchanged = pd.DataFrame(columns=["variable_id", "time_range", "path"])
+    for key, group in new.groupby("_key", sort=False):
+        entry = {"key": ".".join(group[attrs].iloc[0])}
+        for side, name in (("right_only", "added"), ("left_only", "removed")):
+            changed = variables.get((key, side), unchanged)
+            entry[f"variables_{name}"] = sorted(changed["variable_id"])
+            changed = ranges.get((key, side), unchanged)
+            entry[f"time_ranges_{name}"] = {
+                var: sorted(time_ranges)
+                for var, time_ranges in changed.groupby("variable_id")["time_range"]
+            }
+            entry[f"files_{name}"] = len(paths.get((key, side), unchanged))
+        changelog["modified"].append(entry)
+    changelog["modified"].sort(key=lambda entry: entry["key"])
+
+    # a removed dataset is superseded by an added one that only differs in version
+    facets = [attr for attr in attrs if attr != "version"]
+    superseded = pd.merge(
+        pd.DataFrame(changelog["removed"], columns=["key"] + attrs),
+        pd.DataFrame(changelog["added"], columns=["key"] + attrs),
+        on=facets,
+        suffixes=("_old", "_new"),
+    )
+    changelog["superseded"] = [
+        {"old": old_key, "new": new_key}
+        for old_key, new_key in zip(superseded["key_old"], superseded["key_new"])
+    ]
+    return changelog
+
+
+def write_changelog(changelog, filename):
+    """Writes a changelog as json and prints a summary."""
+    _save_json(filename, changelog)
+    print(
+        "changelog: {} added, {} removed, {} modified, {} superseded datasets".format(
+            *(len(changelog[k]) for k in ("added", "removed", "modified", "superseded"))
+        )
+    )
+
+
+def write_catalog(df, catalog):
+    """
+    Writes the catalog, its columnar companion and the Excel file.
+
+    Nothing is written if the content hash of the catalog did not change since
+    the last run (and the files were not modified in the meantime). Otherwise,
+    a changelog against the previous catalog is written and only the Excel sheet
+    rows of changed groups are recomputed.
+
+    Parameters:
+    df (pandas.DataFrame): The catalog DataFrame.
+    catalog (str): The path to the catalog CSV file.
+
+    Returns:
+    bool: True if the catalog was written.
+    """
+    df = canonical_order(df)
+    digest = catalog_digest(df)
+    hashes = _load_json(hash_file(catalog))
+    xlsxfile = _companion(catalog, ".xlsx")
+    if (
+        hashes.get("digest") == digest
+        and hashes.get("csv") == _file_key(catalog)
+        and hashes.get("xlsx") == _file_key(xlsxfile)
+    ):
+        print("catalog unchanged, nothing to write")
+        return False
+    if op.isfile(catalog):
+        old = pd.read_csv(catalog, dtype=str, keep_default_na=False)
+        write_changelog(diff_catalogs(old, df), changelog_file(catalog))
+    df.to_csv(catalog, index=False)
+    write_parquet(df, catalog)
+    sheet = hashes.get("sheet", {})
+    create_excel(catalog, cache=sheet)
+    hashes = {
+        "digest": digest,
+        "csv": _file_key(catalog),
+        "xlsx": _file_key(xlsxfile),
+        "sheet": sheet,
+    }
+    _save_json(hash_file(catalog), hashes)
+    return True
+
+
+def read_previous(catalog):
+    """
+    Reads the entries of an existing catalog.
+
+    Parameters:
+    catalog (str): The path to the catalog CSV file.
+
+    Returns:
+    pandas.DataFrame: The catalog entries indexed by path (empty if there is no catalog).
+    """
+    df = pd.DataFrame(columns=COLS + ["path"], dtype=str)
+    if catalog and op.isfile(catalog):
+        previous = pd.read_csv(catalog, dtype=str, keep_default_na=False)
+        if "path" in previous.columns and set(COLS).issubset(previous.columns):
+            df = previous[COLS + ["path"]]
+    return df.set_index("path", drop=False)
+
+
+def update_catalogs(
+    catalog, roots=None, incremental=False, max_workers=1, harvest=False, processes=None
+):
+    """
+    Updates the catalog with metadata from several root directories.
+
+    All roots are scanned at the same time and share one bounded worker pool
+    for listing directories.
+
+    Parameters:
+    catalog (str): The path to the catalog CSV file.
+    roots (dict): The root directories keyed by project (default: root_dic).
+    incremental (bool): If True, reuse the scan state and the entries of the existing
+        catalog and only parse new or changed files.
+    max_workers (int): The maximum number of concurrent directory listings.
+    harvest (bool): If True, add NetCDF header information (HEADER_COLS), the headers
+        are cached next to the catalog.
+    processes (int): The number of processes for reading headers.
+
+    Returns:
+    pandas.DataFrame: The updated catalog DataFrame, ordered like roots.
+    """
+    if roots is None:
+        roots = root_dic
+    state = load_state(catalog) if incremental else {}
+    previous = read_previous(catalog if incremental else None)
+    headers = load_headers(catalog) if harvest else None
+    root_states = {root: state.get(root, {}) for root in roots.values()}
+    with contextlib.ExitStack() as stack:
+        executor = stack.enter_context(ThreadPoolExecutor(max_workers))
+        drivers = stack.enter_context(ThreadPoolExecutor(len(roots)))
+        process_pool = None
+        if harvest:
+            # spawn, the catalog is created from several threads
+            process_pool = stack.enter_context(
+                ProcessPoolExecutor(processes, mp_context=mp.get_context("spawn"))
+            )
+        futures = [
+            drivers.submit(
+                create_catalog,
+                root,
+                project,
+                state=root_states[root],
+                previous=previous,
+                executor=executor if max_workers > 1 else None,
+                headers=headers,
+                process_pool=process_pool,
+            )
+            for project, root in roots.items()
+        ]
+        dfs = [f.result() for f in futures]
+    state.update(root_states)
+    save_state(catalog, state)
+    df = pd.concat(dfs, ignore_index=True)
+    if harvest:
+        # drop deleted files
+        paths = set(df["path"])
+        save_headers(catalog, {p: h for p, h in headers.items() if p in paths})
+    return df
+
+
+def update_catalog(catalog, root, project, incremental=False, max_workers=1):
     """
     Updates the catalog with metadata from the specified root directory.
 
     Parameters:
     catalog (str): The path to the catalog CSV file.
     root (str): The root directory to scan for metadata.
+    project (str): The project key in pattern_dict.
+    incremental (bool): If True, reuse the scan state and the entries of the existing
+        catalog and only parse new or changed files.
+    max_workers (int): The maximum number of concurrent directory listings.
 
     Returns:
     pandas.DataFrame: The updated catalog DataFrame.
     """
-    df = pd.DataFrame(create_catalog(root, project))[COLS + ["path"]]
-    # print(f"writing catalog to {catalog}")
-    # df.to_csv(catalog, index=False)
-    return df
+    return update_catalogs(
+        catalog, {project: root}, incremental=incremental, max_workers=max_workers
+    )
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the joint evaluation catalog.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only parse new or changed files using the scan state of the last run",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="maximum number of concurrent directory listings (default: 8)",
+    )
+    parser.add_argument(
+        "--headers",
+        action="store_true",
+        help="add NetCDF header information (shape, dtype, chunks, compression, ...)",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="number of processes for reading headers (default: number of CPUs)",
+    )
+    args = parser.parse_args()
     # df = update_catalog(CATALOG, root_dic[project])
     # create_excel(CATALOG)
-    df_CMIP5 = update_catalog(CATALOG, root_dic["CORDEX-CMIP5"], "CORDEX-CMIP5")
-    df_CMIP6 = update_catalog(CATALOG, root_dic["CORDEX-CMIP6"], "CORDEX-CMIP6")
-    df = pd.concat([df_CMIP5, df_CMIP6])
     folder_path = "./"  # os.path.abspath(os.path.join(os.getcwd(), "..", ".."))
-    df.to_csv(os.path.join(folder_path, f"{CATALOG}"), index=False)
-    create_excel(os.path.join(folder_path, f"{CATALOG}"))
+    catalog = os.path.join(folder_path, f"{CATALOG}")
+    df = update_catalogs(
+        catalog,
+        root_dic,
+        incremental=args.incremental,
+        max_workers=args.workers,
+        harvest=args.headers,
+        processes=args.processes,
+    )
+    write_catalog(df, catalog)
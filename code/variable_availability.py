@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 
+import os
+import sys
+
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
 from icecream import ic
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog"))
+from catalog import load_catalog  # noqa: E402
+
 
 def get_studies(dreq):
     studies = set()
@@ -33,6 +39,7 @@ def plot_availability(study, dreq, catalog, plans, outname="availability.png"):
         columns=["frequency", "variable_id"],
         aggfunc="size",
         fill_value=0,
+        observed=True,
     )
     matrix = matrix.replace(0, np.nan)
     plans_empty = pd.DataFrame(columns=matrix.columns, index=plans.index)
@@ -87,8 +94,8 @@ if __name__ == "__main__":
         .loc[:, ["mip_era", "source_id"]]
         .set_index(["mip_era", "source_id"])
     )
-    catalog = pd.read_csv(
-        "catalog.csv", usecols=["variable_id", "frequency", "source_id", "mip_era"]
+    catalog = load_catalog(
+        "catalog.csv", columns=["variable_id", "frequency", "source_id", "mip_era"]
     )
     md_lines = ["# Variable Availability Plots\n"]
     for study in get_studies(dreq):
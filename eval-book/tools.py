@@ -1,15 +1,32 @@
 import cordex as cx
 import cf_xarray as cfxr
+import dask
 import xarray as xr
 import xesmf as xe
 from warnings import warn
 import numpy as np
+import pandas as pd
 import os
+import sys
+import re
+import json
+import hashlib
 import cftime
-from evaltools.source import get_source_collection, open_and_sort
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, reduce
+from operator import attrgetter
+from evaltools.source import open_and_sort
 
 import cmocean
 
+# catalog loading is shared with the catalog scripts in code/catalog
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "code", "catalog")
+)
+from catalog import catalog_source, load_catalog  # noqa: E402
+
 default_attrs_ = [
     "project_id",
     "domain_id",
@@ -105,6 +122,38 @@ variable_mapping = {
     "era5": {"tas": "t2m", "pr": "tp"},
 }
 
+# catalog maintained in this repository (see code/catalog/catalog.py)
+catalog_file = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "catalog.csv"
+)
+collection_file = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "CORDEX-CMIP6.json"
+)
+
+# persistent cache of regridding weights, see create_regridder
+weights_dir = os.environ.get(
+    "XESMF_WEIGHTS_DIR",
+    os.path.join(
+        os.path.expanduser("~"), ".cache", "joint-evaluation", "xesmf-weights"
+    ),
+)
+weights_max_bytes = 10 * 2**30
+
+# process-wide cache of fixed fields (orog, sftlf, areacella), see cached_fx
+fx_cache_max_bytes = 2**30
+
+# cache of rasterized region masks, see region_index
+mask_dir = os.environ.get(
+    "REGION_MASK_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "joint-evaluation", "region-masks"),
+)
+
+# one-time (kerchunk) indexes of observation datasets, see load_obs
+obs_index_dir = os.environ.get(
+    "OBS_INDEX_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "joint-evaluation", "obs-index"),
+)
+
 # List of models that need regridding although they are on rotated pole
 special_case = ["WRF451Q", "RegCM5-0"]
 
@@ -113,31 +162,412 @@ def is_special_case(dset_id):
     return any(source_id in dset_id.split(".") for source_id in special_case)
 
 
-def load_obs(variable, dataset, add_fx=True, mask=True):
-    root = f"/mnt/CORDEX_CMIP6_tmp/aux_data/{dataset}/mon/{variable}/"
-    ds = xr.open_mfdataset(
-        np.sort(list(traverseDir(root))), concat_dim="valid_time", combine="nested"
+def _file_key(filename):
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _load_json(filename):
+    if not os.path.isfile(filename):
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def _save_json(filename, obj):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmpfile = f"{filename}.{os.getpid()}.tmp"
+    with open(tmpfile, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmpfile, filename)
+
+
+def _single_references(filename):
+    # kerchunk references of one netcdf file (netcdf4/hdf5 or classic format)
+    with open(filename, "rb") as f:
+        magic = f.read(4)
+    if magic.startswith(b"CDF"):
+        from kerchunk.netCDF3 import NetCDF3ToZarr
+
+        return NetCDF3ToZarr(filename, inline_threshold=300).translate()
+    from kerchunk.hdf import SingleHdf5ToZarr
+
+    return SingleHdf5ToZarr(filename, inline_threshold=300).translate()
+
+
+def index_obs(files, name, concat_dim="valid_time"):
+    """Returns kerchunk references of a multi-file dataset.
+
+    The references are stored in obs_index_dir and reused as long as no file
+    was added, removed or modified. Otherwise, only new or changed files are
+    indexed again.
+
+    Parameters:
+    - files: sorted list of netcdf files
+    - name: name of the index file
+    - concat_dim: dimension along which the files are concatenated
+
+    Returns:
+    - dict: the combined references
+    """
+    from kerchunk.combine import MultiZarrToZarr
+
+    if not files:
+        raise FileNotFoundError(f"no files to index for {name}")
+    filename = os.path.join(obs_index_dir, f"{name}.json")
+    index = _load_json(filename)
+    keys = {f: _file_key(f) for f in files}
+    if index.get("keys") == keys:
+        return index["refs"]
+    print(f"indexing {name}")
+    old_keys = index.get("keys", {})
+    singles = index.get("singles", {})
+    singles = {
+        f: singles[f] if old_keys.get(f) == keys[f] else _single_references(f)
+        for f in files
+    }
+    with xr.open_dataset(files[0]) as ds:
+        identical = [n for n in ds.variables if concat_dim not in ds[n].dims]
+    refs = MultiZarrToZarr(
+        [singles[f] for f in files],
+        concat_dims=[concat_dim],
+        identical_dims=identical,
+        # decode times, the files may use different reference dates
+        coo_map={concat_dim: f"cf:{concat_dim}"},
+    ).translate()
+    _save_json(filename, {"keys": keys, "singles": singles, "refs": refs})
+    return refs
+
+
+_date_formats = {
+    4: ("%Y", "Y"),
+    6: ("%Y%m", "M"),
+    8: ("%Y%m%d", "D"),
+    10: ("%Y%m%d%H", "h"),
+    12: ("%Y%m%d%H%M", "min"),
+}
+
+
+def _date_period(token):
+    fmt, freq = _date_formats[len(token)]
+    return pd.Period(pd.to_datetime(token, format=fmt), freq=freq)
+
+
+def filename_period(filename):
+    """Returns the time range (start, end) encoded at the end of a filename.
+
+    Understands ranges like tas_..._197901-198012.nc and single dates like
+    era5_t2m_1990.nc or cerra_tp_199001.nc, returns None otherwise.
+    """
+    name = os.path.splitext(os.path.basename(filename))[0]
+    match = re.search(r"(?:^|_)(\d{4,12})-(\d{4,12})$", name) or re.search(
+        r"(?:^|_)(\d{4,12})()$", name
+    )
+    if match is None:
+        return None
+    start, end = match.group(1), match.group(2) or match.group(1)
+    try:
+        return _date_period(start).start_time, _date_period(end).end_time
+    except (KeyError, ValueError):
+        return None
+
+
+def file_periods(files, name, concat_dim="valid_time"):
+    """Returns the time range of each file.
+
+    The range is taken from the filename if possible, otherwise from the time
+    coordinate of the file, which is cached in obs_index_dir.
+    """
+    cachefile = os.path.join(obs_index_dir, f"{name}.times.json")
+    cache = _load_json(cachefile)
+    periods = {}
+    changed = False
+    for f in files:
+        period = filename_period(f)
+        if period is None:
+            key = _file_key(f)
+            if cache.get(f, [None])[0] != key:
+                with xr.open_dataset(f) as ds:
+                    times = ds[concat_dim].values
+                cache[f] = [key, str(times.min()), str(times.max())]
+                changed = True
+            period = pd.Timestamp(cache[f][1]), pd.Timestamp(cache[f][2])
+        periods[f] = period
+    if changed is True:
+        _save_json(cachefile, cache)
+    return periods
+
+
+def _period_bounds(period):
+    # first and last timestamp of a time slice like slice("1980", "2020")
+    bounds = []
+    for value, attr, default in [
+        (period.start, "start_time", pd.Timestamp.min),
+        (period.stop, "end_time", pd.Timestamp.max),
+    ]:
+        if value is None:
+            bounds.append(default)
+        elif isinstance(value, str):
+            bounds.append(getattr(pd.Period(value), attr))
+        else:
+            bounds.append(pd.Timestamp(str(value)))
+    return bounds
+
+
+def select_files(files, period, name, concat_dim="valid_time"):
+    """Returns the files that overlap with a time slice like slice("1980", "2020")."""
+    start, end = _period_bounds(period)
+    return [
+        f
+        for f, (first, last) in file_periods(files, name, concat_dim).items()
+        if first <= end and last >= start
+    ]
+
+
+def open_references(refs):
+    """Opens kerchunk references lazily as one dataset."""
+    import fsspec
+
+    mapper = fsspec.filesystem("reference", fo=refs).get_mapper("")
+    return xr.open_dataset(mapper, engine="zarr", consolidated=False, chunks={})
+
+
+_fx_cache = OrderedDict()
+_fx_cache_lock = threading.Lock()
+
+
+def cached_fx(key, load):
+    """Returns a fixed field from the process-wide LRU cache.
+
+    Fields are loaded into memory with load() if they are not cached yet, the
+    least recently used fields are dropped if the cache exceeds fx_cache_max_bytes.
+
+    Parameters:
+    - key: hashable key, e.g. (dataset, variable, grid_key(grid))
+    - load: function returning the field as DataArray (or None if not available)
+
+    Returns:
+    - DataArray or None
+    """
+    with _fx_cache_lock:
+        if key in _fx_cache:
+            _fx_cache.move_to_end(key)
+            return _fx_cache[key]
+    da = load()
+    if da is not None:
+        da = da.load()
+    with _fx_cache_lock:
+        _fx_cache[key] = da
+        total = sum(getattr(v, "nbytes", 0) for v in _fx_cache.values())
+        while total > fx_cache_max_bytes and len(_fx_cache) > 1:
+            _, old = _fx_cache.popitem(last=False)
+            total -= getattr(old, "nbytes", 0)
+    return da
+
+
+def index_grid(ds, time="time"):
+    """Returns the horizontal index coordinates of a dataset as an empty Dataset."""
+    return xr.Dataset(
+        coords={dim: ds[dim] for dim in ds.dims if dim != time and dim in ds.indexes}
     )
+
+
+def grid_key(grid):
+    """Returns a hash of the index coordinates of a grid."""
+    sha = hashlib.sha256()
+    for dim in sorted(grid.indexes):
+        values = np.ascontiguousarray(grid.indexes[dim].values)
+        sha.update(f"{dim}{values.shape}{values.dtype}".encode())
+        sha.update(values.tobytes())
+    return sha.hexdigest()
+
+
+def _load_obs_fx(dataset, fx, grid):
+    # fixed field of an observation dataset aligned with the grid of the time series
+    files_fx = list(traverseDir(f"/mnt/CORDEX_CMIP6_tmp/aux_data/{dataset}/fx/"))
+    file_fx = [f for f in files_fx if "fixed" in f and fx in f]
+    if not file_fx:
+        return None
+    with xr.open_dataset(file_fx[0]) as ds_fx:
+        ds_fx = fix_360_longitudes(ds_fx, lonname="longitude")
+        ds_fx, _ = xr.align(ds_fx, grid, join="inner")
+        return ds_fx[fx].load()
+
+
+def load_obs(variable, dataset, add_fx=True, mask=True, use_index=True, period=None):
+    root = f"/mnt/CORDEX_CMIP6_tmp/aux_data/{dataset}/mon/{variable}/"
+    name = f"{dataset}_mon_{variable}"
+    files = list(np.sort(list(traverseDir(root))))
+    if not files:
+        raise FileNotFoundError(f"no *.nc files of {name} found below {root}")
+    ds = None
+    if use_index is True:
+        # the index covers all files, a period is selected lazily
+        try:
+            ds = open_references(index_obs(files, name))
+        except ImportError as e:
+            warn(f"{e}, opening {dataset} without index")
+    if ds is None:
+        if period is not None:
+            files = select_files(files, period, name)
+        ds = xr.open_mfdataset(files, concat_dim="valid_time", combine="nested")
     ds = ds.rename({"valid_time": "time"})
+    if period is not None:
+        ds = ds.sel(time=period)
     ds = fix_360_longitudes(ds, lonname="longitude")
 
     if add_fx is True:
-        files_fx = list(traverseDir(f"/mnt/CORDEX_CMIP6_tmp/aux_data/{dataset}/fx/"))
-        files_fx = [f for f in files_fx if "fixed" in f]
+        grid = index_grid(ds)
         for fx in ["orog", "sftlf", "areacella"]:
-            file_fx = [f for f in files_fx if fx in f]
-            if file_fx:
-                ds_fx = xr.open_dataset(file_fx[0])
-                ds_fx = fix_360_longitudes(ds_fx, lonname="longitude")
-                ds_fx, ds = xr.align(ds_fx, ds, join="inner")
+            da = cached_fx(
+                (dataset, fx, grid_key(grid)), lambda: _load_obs_fx(dataset, fx, grid)
+            )
+            if da is not None:
+                if any(da.sizes[dim] != ds.sizes[dim] for dim in grid.dims):
+                    ds = ds.sel({dim: da.indexes[dim] for dim in grid.dims})
                 print(f"merging {dataset} with {fx}")
-                ds[fx] = ds_fx[fx]
+                ds[fx] = da
         if mask is True:
             sftlf = ds["sftlf"]
             ds["mask"] = sftlf > 0
     return ds
 
 
+class FacetIndex:
+    """Inverted index from facet values to row bitmaps of a catalog.
+
+    Queries are answered by bitmap operations: several values of one facet
+    are combined with OR, different facets with AND.
+    """
+
+    def __init__(self, df, facets=None):
+        """
+        Parameters:
+        - df: catalog DataFrame
+        - facets: columns to index (default: the low-cardinality DRS facets)
+        """
+        if facets is None:
+            facets = default_attrs_ + ["mip_era", "activity_id"]
+            facets = [col for col in facets if col in df.columns]
+        self.df = df
+        self.size = len(df)
+        self.bitmaps = {}
+        for facet in facets:
+            # missing values get code -1 and are never matched
+            codes, uniques = pd.factorize(df[facet])
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            bitmaps = {}
+            for code, value in enumerate(uniques):
+                bits = np.zeros(self.size, dtype=bool)
+                bits[order[bounds[code] : bounds[code + 1]]] = True
+                bitmaps[value] = np.packbits(bits)
+            self.bitmaps[facet] = bitmaps
+
+    def bitmap(self, **facets):
+        """Returns the packed row bitmap matching all facets."""
+        nbytes = (self.size + 7) // 8
+        result = np.packbits(np.ones(self.size, dtype=bool))
+        for facet, values in facets.items():
+            if facet not in self.bitmaps:
+                raise KeyError(f"facet {facet} is not indexed")
+            if isinstance(values, str) or not np.iterable(values):
+                values = [values]
+            empty = np.zeros(nbytes, dtype=np.uint8)
+            bitmaps = (self.bitmaps[facet].get(v, empty) for v in values)
+            result &= reduce(np.bitwise_or, bitmaps, empty)
+        return result
+
+    def rows(self, **facets):
+        """Returns the row positions matching all facets."""
+        return np.flatnonzero(np.unpackbits(self.bitmap(**facets), count=self.size))
+
+    def search(self, **facets):
+        """Returns the catalog rows matching all facets, e.g.
+        search(source_id=["REMO2020", "CCLM"], frequency="day")."""
+        return self.df.iloc[self.rows(**facets)]
+
+
+_facet_indexes = {}
+
+
+def get_facet_index(catalog=catalog_file):
+    """
+    Returns the facet index of a catalog.
+
+    The index is built once per catalog version (file and modification time)
+    and shared by all queries in the process. The catalog is loaded with
+    load_catalog of code/catalog/catalog.py (Parquet companion if up to date).
+
+    Parameters:
+    - catalog: path to the catalog CSV file
+
+    Returns:
+    - FacetIndex
+    """
+    filename = catalog_source(catalog)
+    key = (os.path.abspath(filename), os.stat(filename).st_mtime_ns)
+    if key not in _facet_indexes:
+        df = load_catalog(catalog)
+        # keep only the latest version of each catalog
+        for k in [k for k in _facet_indexes if k[0] == key[0]]:
+            del _facet_indexes[k]
+        _facet_indexes[key] = FacetIndex(df)
+    return _facet_indexes[key]
+
+
+def search_catalog(catalog=catalog_file, **facets):
+    """Returns the catalog rows matching all facets using the shared facet index."""
+    return get_facet_index(catalog).search(**facets)
+
+
+def _collection(df, esmcat=collection_file):
+    # intake-esm collection of catalog rows
+    import intake
+
+    df = df.astype({col: object for col in df.columns if df[col].dtype == "category"})
+    with open(esmcat) as f:
+        spec = json.load(f)
+    spec.pop("catalog_file", None)
+    return intake.open_esm_datastore({"esmcat": spec, "df": df.reset_index(drop=True)})
+
+
+def search_collection(catalog=catalog_file, esmcat=collection_file, **facets):
+    """
+    Returns an intake-esm collection of the catalog rows matching all facets,
+    e.g. to be used with open_and_sort.
+    """
+    return _collection(search_catalog(catalog, **facets), esmcat)
+
+
+def source_collection(
+    variables, frequency, add_fx=None, catalog=catalog_file, **facets
+):
+    """
+    Returns the collection of variables and fixed fields of the simulations.
+
+    Replaces get_source_collection of evaltools, the rows are selected with
+    the shared facet index (see get_facet_index) instead of a scan of the
+    catalog for each query.
+
+    Parameters:
+    - variables: list of variables
+    - frequency: frequency of the variables
+    - add_fx: list of fixed fields added to the collection (optional)
+    - catalog: path to the catalog CSV file
+    - facets: further facets, e.g. driving_source_id="ERA5"
+
+    Returns:
+    - intake_esm.esm_datastore
+    """
+    index = get_facet_index(catalog)
+    rows = index.rows(variable_id=variables, frequency=frequency, **facets)
+    if add_fx:
+        fx_rows = index.rows(variable_id=add_fx, frequency="fx", **facets)
+        rows = np.union1d(rows, fx_rows)
+    return _collection(index.df.iloc[rows])
+
+
 def add_bounds(ds):
     if "longitude" not in ds.cf.bounds and "latitude" not in ds.cf.bounds:
         ds = cx.transform_bounds(ds, trg_dims=("vertices_lon", "vertices_lat"))
@@ -168,6 +598,172 @@ def mask_with_sftlf(ds, sftlf=None):
     return ds
 
 
+class GridRegistry:
+    """Registry of the horizontal grids of several datasets.
+
+    Coordinates are rewritten and bounds are computed only once per unique
+    grid and then attached to all datasets on that grid. The registry can be
+    shared by threads, each grid is processed by one of them.
+    """
+
+    def __init__(self, rewrite=True, bounds=True):
+        """
+        Parameters:
+        - rewrite: rewrite the coordinates of rotated grids (see rewrite_coords)
+        - bounds: add missing bounds and lon_b/lat_b vertices (see add_bounds)
+        """
+        self.rewrite = rewrite
+        self.bounds = bounds
+        self.grids = {}
+        self.errors = {}
+        self.members = {}
+        self._lock = threading.Lock()
+        self._grid_locks = {}
+
+    @staticmethod
+    def grid(ds):
+        """Returns the horizontal grid of a dataset (coordinates, bounds and grid mapping)."""
+        dims = set(ds.cf["longitude"].dims) | set(ds.cf["latitude"].dims)
+        names = [
+            name
+            for name, coord in ds.coords.items()
+            if coord.dims and set(coord.dims) <= dims
+        ]
+        names += [
+            ds[name].attrs["bounds"]
+            for name in names
+            if ds[name].attrs.get("bounds") in ds.variables
+        ]
+        names += [
+            name
+            for name, var in ds.data_vars.items()
+            if var.ndim == 0 and "grid_mapping_name" in var.attrs
+        ]
+        grid = ds[list(dict.fromkeys(names))]
+        grid = grid.drop_vars([name for name in grid.coords if name not in names])
+        # placeholder that links the grid mapping (cf_xarray looks it up via data variables)
+        for var in ds.data_vars.values():
+            if "grid_mapping" in var.attrs:
+                var_dims = [dim for dim in var.dims if dim in dims]
+                grid["_grid"] = xr.Variable(
+                    var_dims,
+                    np.zeros([ds.sizes[dim] for dim in var_dims], dtype="i1"),
+                    attrs={"grid_mapping": var.attrs["grid_mapping"]},
+                )
+                break
+        return grid
+
+    @staticmethod
+    def fingerprint(grid):
+        """Returns a hash of the values and attributes of all grid variables."""
+        sha = hashlib.sha256()
+        for name in sorted(grid.variables):
+            var = grid.variables[name]
+            values = np.ascontiguousarray(var.values)
+            sha.update(
+                f"{name}{var.dims}{values.dtype}{sorted(var.attrs.items())}".encode()
+            )
+            sha.update(values.tobytes())
+        return sha.hexdigest()
+
+    def _process(self, grid, dset_id, rewrite):
+        # returns the processed grid and the error rewriting the coordinates
+        error = None
+        if rewrite is True:
+            print(f"Rewriting coordinates for grid of {dset_id}")
+            try:
+                grid = rewrite_coords(grid)
+            except Exception as e:
+                error = e
+        if self.bounds is True:
+            grid = add_bounds(grid)
+        return grid, error
+
+    def apply(self, dset_id, ds, failures=None):
+        """Attaches the processed grid to a dataset, processing the grid if it is new.
+
+        Errors rewriting the coordinates are kept with the grid and appended to
+        failures (see failure_record) for every dataset on that grid if given,
+        otherwise they are warnings.
+        """
+        rewrite = self.rewrite and not is_special_case(dset_id)
+        grid = self.grid(ds)
+        key = (self.fingerprint(grid), rewrite)
+        with self._lock:
+            lock = self._grid_locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self.grids:
+                processed, error = self._process(grid, dset_id, rewrite)
+                with self._lock:
+                    self.grids[key] = processed
+                    self.errors[key] = error
+                    self.members[key] = []
+        with self._lock:
+            self.members[key].append(dset_id)
+        error = self.errors[key]
+        if error is not None:
+            if failures is None:
+                warn(f"Error rewriting coordinates for {dset_id}: {error}")
+            else:
+                failures.append(failure_record(dset_id, "rewrite_coords", error))
+        grid = self.grids[key]
+        # assign variables instead of DataArrays to avoid alignment with the old index
+        ds = ds.assign_coords({name: grid[name].variable for name in grid.coords})
+        for name in grid.data_vars:
+            if name != "_grid":
+                ds[name] = grid[name].variable
+        return ds
+
+    def report(self):
+        """Returns a DataFrame with the number of datasets and their ids per grid."""
+        return pd.DataFrame(
+            {
+                "grid": [key[0][:12] for key in self.members],
+                "rewrite": [key[1] for key in self.members],
+                "datasets": [len(ids) for ids in self.members.values()],
+                "dset_ids": list(self.members.values()),
+            }
+        )
+
+
+# facets of a simulation, fixed fields are shared by all its frequencies and versions
+simulation_attrs = [
+    attr
+    for attr in default_attrs_
+    if attr not in ["frequency", "variable_id", "version"]
+]
+
+
+def _simulations(df):
+    # simulation facets by dset_id (groupby_attrs of the collection joined by ".")
+    groupby = [attr for attr in default_attrs_ if attr != "variable_id"]
+    keys = df[groupby].astype(str).agg(".".join, axis=1)
+    return dict(zip(keys, df[simulation_attrs].itertuples(index=False, name=None)))
+
+
+def _load_model_fx(simulation, fx, grid):
+    # fixed field of a simulation (latest version) aligned with the grid of the time series
+    rows = search_catalog(
+        variable_id=fx, frequency="fx", **dict(zip(simulation_attrs, simulation))
+    )
+    if rows.empty:
+        return None
+    path = rows.sort_values("version")["path"].iloc[-1]
+    with xr.open_dataset(path) as ds_fx:
+        ds_fx, _ = xr.align(ds_fx, grid, join="inner")
+        return ds_fx[fx].reset_coords(drop=True).load()
+
+
+def failure_record(dset_id, step, error):
+    """Returns a failed preparation step as dict (dset_id, step, error, message)."""
+    return {
+        "dset_id": dset_id,
+        "step": step,
+        "error": type(error).__name__,
+        "message": str(error),
+    }
+
+
 def open_datasets(
     variables,
     frequency="mon",
@@ -177,27 +773,89 @@ def open_datasets(
     add_missing_bounds=True,
     rewrite_grid=True,
     apply_fixes=True,
+    registry=None,
+    workers=4,
+    failures=None,
     **kwargs,
 ):
+    """
+    Opens the datasets of the catalog and prepares them for the evaluation.
+
+    The datasets are selected with source_collection from the facet index
+    that is shared by all calls in the process (kwargs are further facets).
+
+    The datasets are prepared concurrently in a pool of workers threads
+    (fixed fields, land mask, rewritten coordinates and bounds). Reads from
+    NetCDF files are serialized by the locks of the xarray backends, so the
+    threads only overlap waiting on storage with computations. A dataset
+    with a failing step keeps the result of the previous steps and the
+    failure is recorded (see failure_record) instead of raised.
+
+    Parameters:
+    - variables: list of variables
+    - workers: maximum number of threads (1 prepares the datasets serially)
+    - failures: list the failures are appended to (printed if not given)
+
+    Returns:
+    - dict of datasets by dset_id, in the order of open_and_sort
+    """
     if merge_fx is True and add_fx is None:
         add_fx = ["orog", "sftlf", "areacella", "sfturf"]
-    cat = get_source_collection(variables, frequency, add_fx=add_fx, **kwargs)
-    dsets = open_and_sort(cat, merge_fx=merge_fx, apply_fixes=apply_fixes)
-    if rewrite_grid is True:
-        for dset_id, ds in dsets.items():
-            if not is_special_case(dset_id):
-                print(f"Rewriting coordinates for {dset_id}")
-                try:
-                    dsets[dset_id] = rewrite_coords(ds)
-                except Exception as e:
-                    warn(f"Error rewriting coordinates for {dset_id}: {e}")
-                    # dsets[dset_id] = ds
-    if mask is True:
-        for ds in dsets.values():
-            mask_with_sftlf(ds)
-    if add_missing_bounds is True:
-        for dset_id, ds in dsets.items():
-            dsets[dset_id] = add_bounds(ds)
+    # fixed fields to be merged are loaded per simulation, see _load_model_fx
+    fx_rows = None if merge_fx is True else add_fx
+    cat = source_collection(variables, frequency, add_fx=fx_rows, **kwargs)
+    dsets = open_and_sort(cat, merge_fx=False, apply_fixes=apply_fixes)
+    simulations = _simulations(cat.df)
+    if registry is None and (rewrite_grid is True or add_missing_bounds is True):
+        # rewrite coordinates and add bounds once per unique grid
+        registry = GridRegistry(rewrite=rewrite_grid, bounds=add_missing_bounds)
+    report = failures is None
+    if report:
+        failures = []
+
+    def prepare(dset_id, ds):
+        # shallow copy, the dataset of open_and_sort is not modified by the workers
+        ds = ds.copy()
+        step = None
+        try:
+            if merge_fx is True:
+                # fixed fields are loaded once per simulation and grid and shared
+                # between calls, frequencies and versions
+                step = "fx"
+                simulation = simulations[dset_id]
+                grid = index_grid(ds)
+                for fx in add_fx:
+                    da = cached_fx(
+                        (simulation, fx, grid_key(grid)),
+                        lambda fx=fx: _load_model_fx(simulation, fx, grid),
+                    )
+                    if da is not None:
+                        if any(da.sizes[dim] != ds.sizes[dim] for dim in grid.dims):
+                            ds = ds.sel({dim: da.indexes[dim] for dim in grid.dims})
+                        ds[fx] = da
+            if mask is True:
+                step = "mask"
+                if "sftlf" in ds:
+                    mask_with_sftlf(ds)
+                else:
+                    error = LookupError("sftlf not found in dataset")
+                    failures.append(failure_record(dset_id, step, error))
+            if registry is not None:
+                step = "grid"
+                ds = registry.apply(dset_id, ds, failures)
+        except Exception as e:
+            failures.append(failure_record(dset_id, step, e))
+        return ds
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(dsets)))) as pool:
+        prepared = list(pool.map(prepare, dsets.keys(), dsets.values()))
+    for dset_id, ds in zip(list(dsets), prepared):
+        dsets[dset_id] = ds
+    if registry is not None:
+        print(f"found {len(registry.grids)} distinct grids for {len(dsets)} datasets")
+    if report and failures:
+        print(f"{len(failures)} failures preparing datasets:")
+        print(pd.DataFrame(failures).to_string(index=False))
     return dsets
 
 
@@ -214,8 +872,89 @@ def create_cordex_grid(domain_id):
     return grid.assign_coords(lon_b=lon_b, lat_b=lat_b)
 
 
-def create_regridder(source, target, method="bilinear"):
-    regridder = xe.Regridder(source, target, method=method, unmapped_to_nan=True)
+def grid_fingerprint(ds):
+    """Returns a hash of the horizontal grid of a dataset as seen by xESMF.
+
+    The hash covers longitude, latitude, their vertices (lon_b, lat_b) and
+    the mask, if present.
+    """
+    sha = hashlib.sha256()
+    coords = {}
+    for name in ["longitude", "latitude"]:
+        try:
+            coords[name] = ds.cf[name]
+        except KeyError:
+            coords[name] = ds[name[:3]]
+    for name in ["lon_b", "lat_b", "mask"]:
+        if name in ds.variables:
+            coords[name] = ds[name]
+    for name, da in coords.items():
+        values = np.ascontiguousarray(da.values)
+        sha.update(f"{name}{da.dims}{values.shape}{values.dtype}".encode())
+        sha.update(values.tobytes())
+    return sha.hexdigest()
+
+
+def _evict_weights(directory=weights_dir, max_bytes=weights_max_bytes):
+    # remove the least recently used weight files until the cache fits into max_bytes
+    files = [
+        (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+        for entry in os.scandir(directory)
+        if entry.name.endswith(".nc") and not entry.name.startswith(".")
+    ]
+    total = sum(size for _, size, _ in files)
+    for _, size, filename in sorted(files):
+        if total <= max_bytes:
+            break
+        os.remove(filename)
+        total -= size
+
+
+_regridders = OrderedDict()
+
+
+def create_regridder(source, target, method="bilinear", cache=True):
+    """Creates an xESMF regridder, reusing cached weights if possible.
+
+    Weights are stored as sparse matrices (xESMF netcdf format) in weights_dir,
+    keyed by the fingerprints of source and target grid and the method. The
+    least recently used files are removed if the cache exceeds weights_max_bytes.
+    The 16 most recently used regridders are also kept in memory.
+
+    Parameters:
+    - source: Dataset on the source grid.
+    - target: Dataset on the target grid.
+    - method: The xESMF regridding method.
+    - cache: If False, weights are always computed and not stored.
+
+    Returns:
+    - xesmf.Regridder
+    """
+    if cache is False:
+        return xe.Regridder(source, target, method=method, unmapped_to_nan=True)
+    key = hashlib.sha256(
+        f"{grid_fingerprint(source)}{grid_fingerprint(target)}{method}".encode()
+    ).hexdigest()[:32]
+    if key in _regridders:
+        _regridders.move_to_end(key)
+        return _regridders[key]
+    filename = os.path.join(weights_dir, f"{method}_{key}.nc")
+    if os.path.isfile(filename):
+        os.utime(filename)
+        regridder = xe.Regridder(
+            source, target, method=method, weights=filename, unmapped_to_nan=True
+        )
+    else:
+        regridder = xe.Regridder(source, target, method=method, unmapped_to_nan=True)
+        os.makedirs(weights_dir, exist_ok=True)
+        tmpfile = os.path.join(weights_dir, f".{key}.{os.getpid()}.nc")
+        regridder.to_netcdf(tmpfile)
+        os.replace(tmpfile, filename)
+        _evict_weights()
+    if len(_regridders) >= 16:
+        # only keep the most recently used regridders in memory
+        _regridders.popitem(last=False)
+    _regridders[key] = regridder
     return regridder
 
 
@@ -243,14 +982,77 @@ def regrid_dsets(dsets, target_grid, method="bilinear"):
     return dsets
 
 
-def mask_invalid(ds, vars=None, threshold=0.1):
+def quality_stats(ds, vars=None, dim="time"):
+    """
+    Computes data quality statistics of variables in a single pass.
+
+    All reductions are computed together, so each chunk of the data is read
+    only once. The results can be passed to mask_invalid, standardize_unit
+    and check_equal_period instead of reading the data again.
+
+    Parameters:
+    ds (xarray.Dataset): The dataset.
+    vars (str or list): The variables (default: all data variables).
+    dim (str): The time dimension.
+
+    Returns:
+    dict: For each variable, the fraction of missing values along dim
+        (nan_fraction, a field), the min, max and mean values and the years
+        with valid data.
+    """
     if isinstance(vars, str):
         vars = [vars]
     if vars is None:
-        var = list(ds.data_vars)
+        vars = list(ds.data_vars)
+    reductions = {}
+    for var in vars:
+        da = ds[var]
+        valid = da.notnull()
+        reductions[f"{var}/nan_fraction"] = 1 - valid.mean(dim)
+        reductions[f"{var}/min"] = da.min()
+        reductions[f"{var}/max"] = da.max()
+        reductions[f"{var}/mean"] = da.mean()
+        if dim in da.dims:
+            reductions[f"{var}/valid_steps"] = valid.any(
+                [d for d in da.dims if d != dim]
+            )
+    results = xr.Dataset(reductions).compute()
+    stats = {}
     for var in vars:
-        var_nan = ds[var].isnull().sum(dim="time") / ds.time.size
-        ds[var] = ds[var].where(var_nan < threshold)
+        stats[var] = {
+            "nan_fraction": results[f"{var}/nan_fraction"].rename(var),
+            "min": results[f"{var}/min"].item(),
+            "max": results[f"{var}/max"].item(),
+            "mean": results[f"{var}/mean"].item(),
+            "years": None,
+        }
+        if f"{var}/valid_steps" in results:
+            steps = results[f"{var}/valid_steps"]
+            stats[var]["years"] = np.unique(ds[dim].dt.year.values[steps.values])
+    return stats
+
+
+def mask_invalid(ds, vars=None, threshold=0.1, stats=None):
+    """
+    Masks cells with a fraction of missing values of threshold or more.
+
+    Parameters:
+    ds (xarray.Dataset): The dataset.
+    vars (str or list): The variables to mask (default: all data variables).
+    threshold (float): The maximum fraction of missing values.
+    stats (dict): The result of quality_stats (computed if not given).
+
+    Returns:
+    xarray.Dataset: The masked dataset.
+    """
+    if isinstance(vars, str):
+        vars = [vars]
+    if vars is None:
+        vars = list(ds.data_vars)
+    if stats is None:
+        stats = quality_stats(ds, vars)
+    for var in vars:
+        ds[var] = ds[var].where(stats[var]["nan_fraction"] < threshold)
     return ds
 
 
@@ -269,39 +1071,411 @@ def height_temperature_correction(model_elev, obs_elev):
     return lapse_rate * (obs_elev - model_elev)
 
 
+season_labels = {
+    "season": [
+        "DJF",
+        "DJF",
+        "MAM",
+        "MAM",
+        "MAM",
+        "JJA",
+        "JJA",
+        "JJA",
+        "SON",
+        "SON",
+        "SON",
+        "DJF",
+    ],
+    "year": ["ANN"] * 12,
+}
+
+
+def season_weights(time, periods=None, freq="season", djf="calendar"):
+    """Weight matrix of a seasonal (or annual) mean of monthly means.
+
+    The weight of each month is its number of days divided by the number of
+    days of all months of the same season (and period), so the seasonal mean
+    is a single matrix product with the time series.
+
+    Parameters:
+    - time: time coordinate (DataArray)
+    - periods: dict of name -> slice of years, e.g. {"1981-2010": slice("1981", "2010")},
+      or None for a single period covering all time steps
+    - freq: "season" (DJF, MAM, JJA, SON) or "year" (ANN)
+    - djf: "calendar" counts December in its calendar year (as time.season),
+      "consecutive" counts it in the following year, so DJF consists of
+      consecutive months
+
+    Returns:
+    - DataArray with dims (time, [period,] season)
+    """
+    month = time.dt.month.values
+    year = time.dt.year.values
+    days = time.dt.days_in_month.values.astype("f8")
+    if djf == "consecutive":
+        year = year + (month == 12)
+    elif djf != "calendar":
+        raise ValueError(f"unknown djf convention: {djf}")
+    labels = np.array(season_labels[freq])[month - 1]
+    seasons = sorted(set(season_labels[freq]))
+    names = [None] if periods is None else list(periods)
+    weights = np.zeros((time.size, len(names), len(seasons)))
+    for p, name in enumerate(names):
+        if name is None:
+            member = np.ones(time.size, dtype=bool)
+        else:
+            period = periods[name]
+            start = -np.inf if period.start is None else int(str(period.start)[:4])
+            stop = np.inf if period.stop is None else int(str(period.stop)[:4])
+            member = (year >= start) & (year <= stop)
+        for s, season in enumerate(seasons):
+            selected = member & (labels == season)
+            total = days[selected].sum()
+            if total > 0:
+                weights[selected, p, s] = days[selected] / total
+    weights = xr.DataArray(
+        weights,
+        dims=("time", "period", "season"),
+        coords={"time": time, "period": names, "season": seasons},
+    )
+    if periods is None:
+        weights = weights.isel(period=0, drop=True)
+    return weights
+
+
+def seasonal_aggregate(da, periods=None, freq="season", djf="calendar", min_count=1):
+    """Seasonal (or annual) means of monthly means in a single pass.
+
+    All seasons and periods are computed with one weighted sum over time (a
+    matrix product with season_weights), which dask evaluates chunk by chunk
+    without a full size temporary. Missing values are skipped like in
+    groupby(...).sum(skipna=True, min_count=min_count).
+
+    Parameters:
+    - da: DataArray or Dataset with a monthly time series
+    - periods, freq, djf: see season_weights
+    - min_count: minimum number of valid months, the result is NaN otherwise
+
+    Returns:
+    - DataArray or Dataset with dims ([period,] season, ...)
+    """
+    if isinstance(da, xr.Dataset):
+        return da.map(
+            lambda v: (
+                seasonal_aggregate(v, periods, freq, djf, min_count)
+                if "time" in v.dims
+                else v
+            )
+        )
+    weights = season_weights(da.time, periods=periods, freq=freq, djf=djf)
+    group_dims = [dim for dim in weights.dims if dim != "time"]
+    # same float type as the data, so the product does not upcast a full size copy
+    dtype = np.result_type(da.dtype, np.float32)
+    valid = da.notnull()
+    # optimize lets einsum use BLAS (tensordot) for the matrix products
+    mean = xr.dot(da.where(valid, 0), weights.astype(dtype), dim="time", optimize=True)
+    count = xr.dot(
+        valid.astype(dtype), (weights > 0).astype(dtype), dim="time", optimize=True
+    )
+    return mean.where(count >= min_count).transpose(*group_dims, ...)
+
+
 def seasonal_mean(da):
-    """Optimized function to calculate seasonal averages from time series of monthly means
+    """Seasonal averages from time series of monthly means, see seasonal_aggregate.
 
     based on: https://xarray.pydata.org/en/stable/examples/monthly-means.html
     """
-    # Get number od days for each month
+    return seasonal_aggregate(da)
+
+
+def seasonal_biases(dsets, reference, var_info, period=None, dim="iid"):
+    """
+    Computes the seasonal mean bias of several datasets in one task graph.
+
+    The seasonal means of all datasets and their differences to the reference
+    are built lazily and evaluated with a single dask.compute, so the
+    scheduler can overlap reading one dataset with computing another.
+
+    Parameters:
+    dsets (dict): The datasets by dataset id (on the grid of the reference).
+    reference (xarray.DataArray): The seasonal mean of the reference (or its
+        time series, then the seasonal mean is part of the same graph).
+    var_info (dict): An entry of var_dic, with variable and diff ("abs" or
+        "rel", relative differences are in percent).
+    period (slice): The period of the seasonal means (default: all times).
+    dim (str): The name of the dataset dimension.
+
+    Returns:
+    xarray.DataArray: The bias named after the variable with dims
+        (dim, season, y, x).
+    """
+    variable = var_info["variable"]
+    if isinstance(reference, xr.Dataset):
+        reference = reference[variable]
+    if "time" in reference.dims:
+        if period is not None:
+            reference = reference.sel(time=period)
+        reference = seasonal_mean(reference)
+    diffs = {}
+    for dset_id, ds in dsets.items():
+        if variable not in ds.variables:
+            continue
+        da = ds[variable]
+        if period is not None:
+            da = da.sel(time=period)
+        mean = seasonal_mean(da)
+        if var_info["diff"] == "abs":
+            diffs[dset_id] = mean - reference
+        elif var_info["diff"] == "rel":
+            diffs[dset_id] = 100 * (mean - reference) / reference
+        else:
+            raise ValueError(f"unknown difference: {var_info['diff']}")
+    if not diffs:
+        # no dataset has the variable, the bias has an empty dataset dimension
+        bias = reference.expand_dims({dim: np.array([], dtype=str)})
+        return bias.rename(variable)
+    (diffs,) = dask.compute(diffs)
+    bias = xr.concat(
+        list(diffs.values()),
+        dim=xr.DataArray(list(diffs), dims=dim, name=dim),
+        compat="override",
+        coords="minimal",
+    )
+    return bias.rename(variable)
+
+
+def _seasonal_mean_groupby(da):
+    # former implementation of seasonal_mean, kept for seasonal_memory_report
     month_length = da.time.dt.days_in_month
-    # Calculate the weights by grouping by 'time.season'.
     weights = (
         month_length.groupby("time.season") / month_length.groupby("time.season").sum()
     )
-
-    # Test that the sum of the weights for each season is 1.0
-    # np.testing.assert_allclose(weights.groupby("time.season").sum().values, np.ones(4))
-
-    # Calculate the weighted average
     return (
         (da * weights).groupby("time.season").sum(dim="time", skipna=True, min_count=1)
     )
 
 
-def regional_mean(ds, regions=None, weights=None, aggr=None):
+def seasonal_memory_report(da):
+    """Compares the peak memory of seasonal_mean with the former groupby implementation.
+
+    Parameters:
+    - da: DataArray with a monthly time series (loaded into memory)
+
+    Returns:
+    - dict with the peak memory in MB of both implementations and their ratio
+    """
+    import tracemalloc
+
+    da = da.load()
+    peaks = {}
+    for name, func in [("groupby", _seasonal_mean_groupby), ("matrix", seasonal_mean)]:
+        tracemalloc.start()
+        func(da).load()
+        peaks[name] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    peaks["reduction"] = peaks["groupby"] / peaks["matrix"]
+    return peaks
+
+
+def regions_key(regions):
+    """Returns a hash of the names, numbers and polygons of a regionmask.Regions."""
+    sha = hashlib.sha256()
+    sha.update(f"{regions.name}{regions.numbers}{regions.abbrevs}".encode())
+    for polygon in regions.polygons:
+        sha.update(polygon.wkb)
+    return sha.hexdigest()
+
+
+def coords_key(*arrays):
+    """Returns a hash of the values of coordinate arrays."""
+    sha = hashlib.sha256()
+    for da in arrays:
+        values = np.ascontiguousarray(da.values)
+        sha.update(f"{da.dims}{values.shape}{values.dtype}".encode())
+        sha.update(values.tobytes())
+    return sha.hexdigest()
+
+
+_region_indexes = {}
+
+
+def region_index(regions, lon, lat):
+    """Returns the cells of each region as sparse (regions x cells) matrix.
+
+    The masks are rasterized once per region set and grid and cached in
+    memory and in mask_dir.
+
+    Parameters:
+    - regions: regionmask.Regions
+    - lon, lat: longitude and latitude coordinates of the grid
+
+    Returns:
+    - scipy.sparse.csr_matrix: region membership of the flattened cells
+    - dict: region coordinates (region, abbrevs, names)
+    """
+    from scipy import sparse
+
+    key = f"{regions_key(regions)[:16]}_{coords_key(lon, lat)[:16]}"
+    if key in _region_indexes:
+        return _region_indexes[key]
+    filename = os.path.join(mask_dir, f"{key}.npz")
+    if os.path.isfile(filename):
+        with np.load(filename) as f:
+            matrix = sparse.csr_matrix(
+                (np.ones(f["indices"].size, dtype=bool), f["indices"], f["indptr"]),
+                shape=tuple(f["shape"]),
+            )
+            coords = {name: f[name] for name in ["region", "abbrevs", "names"]}
+    else:
+        dims = tuple(dict.fromkeys(lat.dims + lon.dims))
+        mask = regions.mask_3D(lon, lat, drop=False).transpose("region", *dims)
+        matrix = sparse.csr_matrix(mask.values.reshape(mask.region.size, -1))
+        coords = {name: mask[name].values for name in ["region", "abbrevs", "names"]}
+        os.makedirs(mask_dir, exist_ok=True)
+        tmpfile = os.path.join(mask_dir, f".{key}.{os.getpid()}.npz")
+        np.savez(
+            tmpfile,
+            indices=matrix.indices,
+            indptr=matrix.indptr,
+            shape=matrix.shape,
+            **coords,
+        )
+        os.replace(tmpfile, filename)
+    _region_indexes[key] = matrix, coords
+    return matrix, coords
+
+
+def _sparse_weighted_mean(values, matrix, ndim=1):
+    # weighted means of the flattened cells (last ndim axes) for each row of matrix
+    flat = values.reshape(-1, matrix.shape[1])
+    valid = ~np.isnan(flat)
+    total = matrix @ np.where(valid, flat, 0).T
+    norm = matrix @ valid.T.astype(total.dtype)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = np.where(norm > 0, total / norm, np.nan)
+    return result.T.reshape(values.shape[: values.ndim - ndim] + (matrix.shape[0],))
+
+
+def _quantile(values, q):
+    # linear interpolated quantile of the last axis, NaN are ignored
+    n = values.shape[-1]
+    if n == 0:
+        return np.full(values.shape[:-1], np.nan, dtype=values.dtype)
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=-1)
+    if (count == n).all():
+        # no missing values: partition around the two neighbouring ranks
+        h = (n - 1) * q
+        lo = int(np.floor(h))
+        hi = min(lo + 1, n - 1)
+        values = np.partition(values, sorted({lo, hi}), axis=-1)
+        below, above = values[..., lo], values[..., hi]
+        return below + (h - lo) * (above - below)
+    values = np.sort(values, axis=-1)  # NaN are sorted to the end
+    h = np.maximum(count - 1, 0) * q
+    lo = np.floor(h).astype(int)
+    hi = np.minimum(lo + 1, np.maximum(count - 1, 0))
+    below = np.take_along_axis(values, lo[..., None], axis=-1)[..., 0]
+    above = np.take_along_axis(values, hi[..., None], axis=-1)[..., 0]
+    return np.where(count > 0, below + (h - lo) * (above - below), np.nan)
+
+
+def _sparse_quantile(values, matrix, ndim=1, q=0.95):
+    # exact quantile of the cells of each row of matrix, one region at a time
+    flat = values.reshape(-1, matrix.shape[1])
+    dtype = np.result_type(flat.dtype, np.float16)
+    result = np.empty((flat.shape[0], matrix.shape[0]), dtype=dtype)
+    for region in range(matrix.shape[0]):
+        cells = matrix.indices[matrix.indptr[region] : matrix.indptr[region + 1]]
+        subset = flat[:, cells]
+        # cells that are always missing (e.g., masked) are not relevant
+        keep = ~np.isnan(subset).all(axis=0)
+        if not keep.all():
+            subset = subset[:, keep]
+        result[:, region] = _quantile(subset, q)
+    return result.reshape(values.shape[: values.ndim - ndim] + (matrix.shape[0],))
+
+
+def _sparse_quantile_histogram(values, matrix, ndim=1, q=0.95, bins=1024):
+    """
+    Approximate quantile of the cells of each row of matrix.
+
+    Regions with at most `bins` cells are computed exactly (see
+    _sparse_quantile). For larger regions, the cells of each time step are
+    binned into a histogram of `bins` bins between the regional minimum and
+    maximum, the values of the two order statistics next to the quantile rank
+    are located by interpolation inside their bins and then interpolated
+    linearly like the exact quantile. Since both order statistics lie in the
+    bins they are estimated from, the error is at most (max - min) / bins of
+    the region and time step. Time steps are processed one at a time, so only
+    one histogram per region is kept in addition to the input block.
+    """
+    flat = values.reshape(-1, matrix.shape[1])
+    dtype = np.result_type(flat.dtype, np.float16)
+    nregions = matrix.shape[0]
+    result = np.full((flat.shape[0], nregions), np.nan, dtype=dtype)
+    small = np.diff(matrix.indptr) <= bins
+    if small.any():
+        result[:, small] = _sparse_quantile(flat, matrix[small], q=q)
+    if small.all():
+        return result.reshape(values.shape[: values.ndim - ndim] + (nregions,))
+    large = np.flatnonzero(~small)
+    matrix = matrix[large]
+    rows = np.repeat(np.arange(large.size), np.diff(matrix.indptr))
+    for step, field in enumerate(flat):
+        # cell values grouped by region (csr order), the range is per region
+        cells = field[matrix.indices].astype(dtype)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            lower = np.fmin.reduceat(cells, matrix.indptr[:-1])
+            upper = np.fmax.reduceat(cells, matrix.indptr[:-1])
+            width = (upper - lower) / bins
+            index = (cells - lower[rows]) / width[rows]
+        index = np.where(width[rows] > 0, np.minimum(index, bins - 1), 0)
+        index = np.where(np.isnan(cells), bins, index).astype(int)
+        counts = np.bincount(
+            rows * (bins + 1) + index, minlength=large.size * (bins + 1)
+        ).reshape(large.size, bins + 1)[:, :bins]
+        cumulative = counts.cumsum(axis=-1)
+        count = cumulative[:, -1]
+
+        def _order_statistic(rank):
+            # value of the 0-based rank, interpolated inside its bin
+            k = (cumulative > rank[:, None]).argmax(axis=-1)
+            inside = np.take_along_axis(counts, k[:, None], axis=-1)[:, 0]
+            before = np.take_along_axis(cumulative, k[:, None], axis=-1)[:, 0]
+            before = before - inside
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return lower + (k + (rank - before + 0.5) / inside) * width
+
+        h = np.maximum(count - 1, 0) * q
+        lo = np.floor(h)
+        hi = np.minimum(lo + 1, np.maximum(count - 1, 0))
+        below, above = _order_statistic(lo), _order_statistic(hi)
+        estimate = below + (h - lo) * (above - below)
+        result[step, large] = np.where(count > 0, estimate, np.nan)
+    return result.reshape(values.shape[: values.ndim - ndim] + (nregions,))
+
+
+def regional_mean(ds, regions=None, weights=None, aggr=None, method="exact"):
     """
     Compute the regional mean of a dataset over specified regions.
 
+    Weighted means are computed for all regions at once as product of a
+    sparse (regions x cells) matrix with the flattened field, the region
+    masks are cached (see region_index). For aggr="P95", the 95th percentile
+    of the absolute values is computed for each region from the cells of that
+    region only, so memory scales with the number of cells, not with
+    regions x cells.
+
     Parameters:
     ds (xarray.Dataset): The dataset to compute the regional mean for.
     regions (regionmask.Regions): The regions to compute the mean over.
+    method (str): "exact" (partition based) or "approximate" (histogram of
+        1024 bins, error at most 1/1024 of the regional range) percentiles.
 
     Returns:
     xarray.Dataset: The regional mean values.
     """
-    mask = 1.0
     if "lon" in ds.coords:
         x = "lon"
         y = "lat"
@@ -310,121 +1484,344 @@ def regional_mean(ds, regions=None, weights=None, aggr=None):
         y = "latitude"
     if weights is None:
         weights = xr.ones_like(ds[x])
-    if regions:
-        mask = regions.mask_3D(ds[x], ds[y], drop=False)
     if aggr == "mean":
-        result = ds.cf.weighted(mask * weights).mean(dim=("X", "Y"), skipna=True)
-    elif aggr == "P95":
-        ds = np.abs(ds)
-        ds = ds.where(mask)
-        result = ds.cf.quantile(0.95, dim=["X", "Y"], skipna=True)
+        return _regional_weighted_mean(ds, ds[x], ds[y], regions, weights)
+    if aggr == "P95":
+        return _regional_quantile(np.abs(ds), ds[x], ds[y], regions, 0.95, method)
+    raise ValueError(f"unknown aggregation: {aggr}")
 
-    return result
 
+def _region_matrix(ds, lon, lat, regions):
+    from scipy import sparse
+
+    dims = tuple(dict.fromkeys(lat.dims + lon.dims))
+    if regions:
+        matrix, coords = region_index(regions, lon, lat)
+    else:
+        ncells = int(np.prod([ds.sizes[dim] for dim in dims]))
+        matrix, coords = sparse.csr_matrix(np.ones((1, ncells), dtype=bool)), None
+    return dims, matrix, coords
+
+
+def _apply_regions(ds, dims, matrix, coords, func, **kwargs):
+    # applies func(values, matrix, ndim, **kwargs) to all variables on the grid
+    def _apply(da):
+        if not set(dims) <= set(da.dims):
+            return da
+        result = xr.apply_ufunc(
+            func,
+            da,
+            kwargs={"matrix": matrix, "ndim": len(dims), **kwargs},
+            input_core_dims=[list(dims)],
+            output_core_dims=[["region"]],
+            dask="parallelized",
+            output_dtypes=[np.result_type(da.dtype, matrix.dtype, np.float16)],
+            dask_gufunc_kwargs={
+                "output_sizes": {"region": matrix.shape[0]},
+                "allow_rechunk": True,
+            },
+        )
+        if coords is None:
+            return result.isel(region=0, drop=True)
+        return result.assign_coords(
+            region=coords["region"],
+            abbrevs=("region", coords["abbrevs"]),
+            names=("region", coords["names"]),
+        )
+
+    if isinstance(ds, xr.Dataset):
+        return ds.map(_apply)
+    return _apply(ds)
 
-def regional_means(dsets, regions=None, aggr=None):
+
+def _regional_weighted_mean(ds, lon, lat, regions, weights):
+    from scipy import sparse
+
+    dims, matrix, coords = _region_matrix(ds, lon, lat, regions)
+    cell_weights = xr.broadcast(weights, lat, lon)[0].transpose(*dims).fillna(0).values
+    matrix = sparse.csr_matrix(matrix.multiply(cell_weights.reshape(1, -1)))
+    return _apply_regions(ds, dims, matrix, coords, _sparse_weighted_mean)
+
+
+def _regional_quantile(ds, lon, lat, regions, q, method="exact"):
+    dims, matrix, coords = _region_matrix(ds, lon, lat, regions)
+    if method == "exact":
+        func = _sparse_quantile
+    elif method == "approximate":
+        func = _sparse_quantile_histogram
+    else:
+        raise ValueError(f"unknown method: {method}")
+    result = _apply_regions(ds, dims, matrix, coords, func, q=q)
+    return result.assign_coords(quantile=q)
+
+
+def regional_means(dsets, regions=None, aggr=None, method="exact"):
     """
     Compute the regional means for multiple datasets over specified regions.
 
     Parameters:
     dsets (dict): A dictionary of datasets to compute the regional means for.
     regions (regionmask.Regions): The regions to compute the means over.
+    method (str): The percentile method for aggr="P95" (see regional_mean).
 
     Returns:
     xarray.Dataset: The concatenated regional mean values for all datasets.
     """
     concat_dim = xr.DataArray(list(dsets.keys()), dims="iid", name="iid")
     return xr.concat(
-        [regional_mean(ds, regions, None, aggr) for ds in dsets.values()],
+        [regional_mean(ds, regions, None, aggr, method) for ds in dsets.values()],
         dim=concat_dim,
         coords="minimal",
         compat="override",
     )
 
 
-def standardize_unit(ds, variable):
-    if variable == "tas":
-        ds = convert_celsius_to_kelvin(ds, variable)
-    elif variable == "pr":
-        ds = convert_precipitation_to_mm(ds, variable)
-    return ds
+# units inferred from the data, by (dataset key, variable), see infer_temperature_units
+_inferred_units = {}
 
 
-def convert_celsius_to_kelvin(ds, variable, threshold=200):
+def _time_sample(da, dim="time", samples=8):
+    # evenly spaced time steps, one from each of the sampled chunks for dask arrays
+    if dim not in da.dims or da.sizes[dim] <= samples:
+        return da
+    if da.chunks:
+        sizes = da.chunks[da.get_axis_num(dim)]
+        starts = np.cumsum((0,) + sizes[:-1])
+        index = starts[np.linspace(0, len(starts) - 1, samples).round().astype(int)]
+    else:
+        index = np.linspace(0, da.sizes[dim] - 1, samples).round().astype(int)
+    return da.isel({dim: np.unique(index)})
+
+
+def infer_temperature_units(da, key=None, threshold=200, samples=8):
     """
-    Converts all temperature variables in an xarray Dataset from degrees Celsius to Kelvin
-    based on the 'units' attribute, value magnitude, or 'standard_name' attribute.
+    Infers if a temperature without units attribute is in degC or K.
+
+    The decision is made from the maximum of a few evenly spaced time steps.
+    Only if the sample has no valid values or its maximum is between
+    threshold / 2 and threshold, the maximum of all data is computed.
+    Decisions are memoized by (key, variable name).
 
     Parameters:
-        ds (xarray.Dataset): The input dataset.
-        threshold (float): A heuristic threshold (default=200) to assume temperatures
-                           below this value might be in Celsius.
+    da (xarray.DataArray): The temperature.
+    key (str): The dataset id (no memoization if None).
+    threshold (float): Temperatures below this value are assumed to be in degC.
+    samples (int): The number of sampled time steps.
 
     Returns:
-        xarray.Dataset: A new dataset with converted temperature values.
-    """
-    ds = ds.copy()  # Avoid modifying the original dataset
-
-    for var in ds.data_vars:
-        if var == variable:
-            units = ds[var].attrs.get("units", "").lower()
-            standard_name = ds[var].attrs.get("standard_name", "").lower()
-
-            # Check if units explicitly indicate Celsius
-            if units in ["c", "°c", "celsius", "degc"]:
-                ds[var] = ds[var] + 273.15
-                ds[var].attrs["units"] = "K"
-                print("Convert celsius to kelvin")
-
-            # If no unit attribute exists, check standard_name for temperature-related terms
-            elif standard_name in [
-                "air_temperature",
-                "sea_surface_temperature",
-                "surface_temperature",
-            ]:
-                if ds[var].max().compute() < threshold:  # Likely in °C
-                    ds[var] = ds[var] + 273.15
-                    ds[var].attrs["units"] = "K"
-                    print("Convert celsius to kelvin")
+    str: "degC" or "K".
+    """
+    if key is not None and (key, da.name) in _inferred_units:
+        return _inferred_units[(key, da.name)]
+    maximum = float(_time_sample(da, samples=samples).max().compute())
+    if np.isnan(maximum) or threshold / 2 <= maximum < threshold:
+        maximum = float(da.max().compute())
+    units = "degC" if maximum < threshold else "K"
+    if key is not None:
+        _inferred_units[(key, da.name)] = units
+    return units
+
+
+# canonical spelling of units found in the data
+unit_aliases = {
+    "k": "K",
+    "kelvin": "K",
+    "c": "degC",
+    "°c": "degC",
+    "celsius": "degC",
+    "degc": "degC",
+    "deg_c": "degC",
+    "degrees_celsius": "degC",
+    "m": "m",
+    "meters": "m",
+    "mm": "mm",
+    "mm/day": "mm day-1",
+    "mm day-1": "mm day-1",
+    "kg m-2 s-1": "kg m-2 s-1",
+    "kg/m/s2": "kg m-2 s-1",
+    "kg m**-2 s**-1": "kg m-2 s-1",
+    "kg m-2": "kg m-2",
+    "pa": "Pa",
+    "hpa": "hPa",
+    "%": "%",
+    "1": "1",
+}
 
-    return ds
+# (units, target): (scale, offset), i.e., target = units * scale + offset
+unit_conversions = {
+    ("degC", "K"): (1.0, 273.15),
+    ("K", "degC"): (1.0, -273.15),
+    ("hPa", "Pa"): (100.0, 0.0),
+    ("Pa", "hPa"): (0.01, 0.0),
+    ("1", "%"): (100.0, 0.0),
+    ("%", "1"): (0.01, 0.0),
+    ("m", "mm"): (1000.0, 0.0),
+    # daily accumulated precipitation (ERA5, CERRA) and fluxes
+    ("m", "mm day-1"): (1000.0, 0.0),
+    ("mm", "mm day-1"): (1.0, 0.0),
+    ("kg m-2", "mm day-1"): (1.0, 0.0),
+    ("kg m-2 s-1", "mm day-1"): (86400.0, 0.0),
+    ("mm day-1", "kg m-2 s-1"): (1.0 / 86400, 0.0),
+}
 
+# targets that differ from the data request (precipitation is evaluated in mm/day)
+unit_targets = {"pr": "mm day-1"}
 
-def convert_precipitation_to_mm(ds, variable):
+temperature_names = [
+    "air_temperature",
+    "sea_surface_temperature",
+    "surface_temperature",
+]
+
+# data request of the joint evaluation (units of all requested variables)
+dreq_file = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "dreq_EUR_joint_evaluation.csv"
+)
+
+
+@lru_cache
+def dreq_units():
+    """Returns the units of the data request by variable (out_name)."""
+    dreq = pd.read_csv(dreq_file, usecols=["out_name", "units"])
+    return dreq.drop_duplicates("out_name").set_index("out_name")["units"].to_dict()
+
+
+def target_units(variable):
+    """Returns the units a variable is standardized to (None if unknown)."""
+    return unit_targets.get(variable, dreq_units().get(variable))
+
+
+def _scale_offset(values, scale, offset):
+    if hasattr(values, "map_blocks"):
+        # one graph layer for dask arrays
+        return values.map_blocks(_scale_offset, scale, offset, dtype=values.dtype)
+    return values * scale + offset if offset else values * scale
+
+
+def convert_units(da, units, target):
     """
-    Converts all precipitation variables in an xarray Dataset to millimeters (mm)
-    based on the 'units' attribute or 'standard_name' attribute.
+    Converts a DataArray lazily with a single scale and offset.
 
     Parameters:
-        ds (xarray.Dataset): The input dataset.
+    da (xarray.DataArray): The data.
+    units (str): The units of the data.
+    target (str): The target units.
 
     Returns:
-        xarray.Dataset: A new dataset with converted precipitation values.
+    xarray.DataArray: The converted data (da itself for identical units, only
+        relabeled for a scale of one) or None if the conversion is unknown.
+    """
+    units = unit_aliases.get(units.lower(), units)
+    target = unit_aliases.get(target.lower(), target)
+    if units == target:
+        return da
+    if (units, target) not in unit_conversions:
+        return None
+    scale, offset = unit_conversions[(units, target)]
+    if scale == 1 and offset == 0:
+        result = da.copy(deep=False)
+    else:
+        result = xr.apply_ufunc(
+            _scale_offset,
+            da,
+            kwargs={"scale": scale, "offset": offset},
+            dask="allowed",
+            keep_attrs=True,
+        )
+    result.attrs["units"] = target
+    return result
+
+
+def standardize_units(
+    ds, variables=None, stats=None, key=None, targets=None, threshold=200
+):
     """
-    ds = ds.copy()  # Avoid modifying the original dataset
+    Converts variables to the units of the data request.
+
+    The target units are taken from dreq_EUR_joint_evaluation.csv (or
+    unit_targets). Each variable is converted with one lazy scale and offset,
+    variables already in the target units are not touched. Temperatures
+    without units attribute are checked with quality_stats results or
+    infer_temperature_units.
 
-    for var in ds.data_vars:
-        if var == variable:
-            units = ds[var].attrs.get("units", "").lower()
-            # standard_name = ds[var].attrs.get("standard_name", "").lower()
+    Parameters:
+    ds (xarray.Dataset): The dataset.
+    variables (str or list): The variables (default: all data variables).
+    stats (dict): The result of quality_stats.
+    key (str): The dataset id, see infer_temperature_units.
+    targets (dict): Target units by variable, overriding the data request.
+    threshold (float): Temperatures without units below this value are
+        assumed to be in degC.
 
-            # Check if units explicitly indicate meters (m) or kilograms per meter per second squared (kg/m/s²)
-            if units in ["m", "meters"]:
-                ds[var] = ds[var] * 1000  # Convert from meters to millimeters
-                ds[var].attrs["units"] = "mm"
-                print("Convert precipitation from meters to millimeters (mm).")
+    Returns:
+    xarray.Dataset: The dataset with converted variables.
+    """
+    if isinstance(variables, str):
+        variables = [variables]
+    if variables is None:
+        variables = list(ds.data_vars)
+    targets = targets or {}
+    converted = {}
+    for var in variables:
+        if var not in ds.data_vars:
+            continue
+        target = targets.get(var, target_units(var))
+        if target is None:
+            continue
+        da = ds[var]
+        units = da.attrs.get("units", "")
+        if not units and unit_aliases.get(target.lower(), target) == "K":
+            if da.attrs.get("standard_name", "").lower() not in temperature_names:
+                continue
+            if stats and var in stats:
+                units = "degC" if stats[var]["max"] < threshold else "K"
+            else:
+                units = infer_temperature_units(da, key, threshold)
+        if not units:
+            continue
+        result = convert_units(da, units, target)
+        if result is None:
+            warn(f"no conversion of {var} from {units} to {target}")
+        elif result is not da:
+            print(f"Convert {var} from {units} to {target}")
+            converted[var] = result
+    if not converted:
+        return ds
+    return ds.assign(converted)
+
+
+def standardize_unit(ds, variable, stats=None, key=None):
+    return standardize_units(ds, variable, stats=stats, key=key)
+
+
+def convert_celsius_to_kelvin(ds, variable, threshold=200, stats=None, key=None):
+    """
+    Converts a temperature variable from degrees Celsius to Kelvin
+    (see standardize_units).
+    """
+    return standardize_units(
+        ds, variable, stats, key, targets={variable: "K"}, threshold=threshold
+    )
 
-            elif units in ["kg m-2 s-1", "kg/m/s2"]:
-                # Precipitation rate in kg/m/s² can be converted to mm/s by multiplying by 1000
-                ds[var] = ds[var] * 86400  # Convert kg/m/s² to mm/day
-                ds[var].attrs["units"] = "mm"
-                print("Convert precipitation from kg/m/s² to mm/day.")
 
-    return ds
+def convert_precipitation_to_mm(ds, variable):
+    """
+    Converts a precipitation variable to millimeters per day
+    (see standardize_units).
+    """
+    return standardize_units(ds, variable, targets={variable: "mm day-1"})
 
 
-def check_equal_period(ds, period):
-    years_in_ds = np.unique(ds.time.dt.year.values)
+def check_equal_period(ds, period, stats=None):
+    if stats:
+        # years with valid data of any variable (see quality_stats)
+        years_in_ds = reduce(
+            np.union1d,
+            [s["years"] for s in stats.values() if s["years"] is not None],
+            np.array([], dtype=int),
+        )
+    else:
+        years_in_ds = np.unique(ds.time.dt.year.values)
     expected_years = np.arange(int(period.start), int(period.stop) + 1)
     return np.all(np.isin(expected_years, years_in_ds))
 
@@ -487,41 +1884,92 @@ def traverseDir(root):
 #    return season_da
 
 
-def select_season(ds: xr.DataArray) -> xr.DataArray:
+def select_season(ds: xr.DataArray, djf: str = "calendar") -> xr.DataArray:
     """
-    Add a new dimension 'season' based on the month of the time coordinate.
+    Arrange the time steps by season and year.
+
+    The time dimension is replaced by (season, year, month), where month is the
+    position of a time step within its season and year, so all values are kept
+    without padding (except for incomplete seasons at the ends). One value per
+    season and year is given by .mean("month"), e.g., for correlations or
+    standard deviations of the interannual variability along "year".
 
     Parameters:
-    - data: xarray DataArray with a 'time' dimension
-    - season_months: dictionary mapping season names to lists of months (1-12)
+    - ds: xarray DataArray or Dataset with a 'time' dimension
+    - djf: "calendar" counts December in its calendar year (like time.year),
+      "consecutive" counts it in the following year
 
     Returns:
-    - DataArray with a new 'season' dimension added
+    - DataArray or Dataset with dimensions (season, year, month) instead of time
     """
 
-    season_months = {
-        "winter": [12, 1, 2],
-        "spring": [3, 4, 5],
-        "summer": [6, 7, 8],
-        "fall": [9, 10, 11],
-    }
+    season_names = ["winter", "spring", "summer", "fall"]
+    # season index of each month (winter: DJF, spring: MAM, summer: JJA, fall: SON)
+    month_to_season = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
 
-    # Create a list of seasons based on the 'time' coordinate
-    season_dim = {}
-    for season, months in season_months.items():
-        mask = ds["time"].dt.month.isin(months)
-        season_dim[season] = ds.where(mask, np.nan)
+    month = ds["time"].dt.month.values
+    year = ds["time"].dt.year.values
+    if djf == "consecutive":
+        year = year + (month == 12)
+    elif djf != "calendar":
+        raise ValueError(f"unknown djf convention: {djf}")
+    season = month_to_season[month - 1]
+    years, year_index = np.unique(year, return_inverse=True)
+
+    # position of each time step within its season and year
+    group = season * len(years) + year_index
+    slot = pd.Series(group).groupby(group).cumcount().to_numpy()
+    index = np.full((len(season_names), len(years), slot.max() + 1), -1)
+    index[season, year_index, slot] = np.arange(ds["time"].size)
+
+    valid = xr.DataArray(index >= 0, dims=("season", "year", "month"))
+    season_da = ds.isel(time=valid.copy(data=np.maximum(index, 0)))
+    if not valid.all():
+        season_da = season_da.where(valid)
+
+    return season_da.assign_coords(season=season_names, year=years)
 
-    season_da = xr.concat(
-        list(season_dim.values()),
-        dim="season",
-        coords="minimal",
-        compat="override",
-    )
 
-    season_da.coords["season"] = ["winter", "spring", "summer", "fall"]
+def taylor_statistics(model, reference, dim="year"):
+    """
+    Computes the statistics of a Taylor diagram for all datasets, regions and seasons.
+
+    Seasonal means of each year are taken if the data is arranged by season,
+    year and month (see select_season). Only pairs where model and reference
+    are both valid are used, so missing years do not bias the statistics.
+    Inputs may be lazy (dask), the result is computed with the caller.
 
-    return season_da
+    Parameters:
+    model (xarray.DataArray): The models, e.g., with dims (iid, season, year, month, region).
+    reference (xarray.DataArray): The reference, without the iid dimension.
+    dim (str): The dimension of the time series.
+
+    Returns:
+    xarray.Dataset: std (standard deviation normalized by the reference), corr
+        (Pearson correlation), crmsd (centered RMS difference normalized by
+        the reference standard deviation) and count (number of valid pairs).
+    """
+    if "month" in model.dims:
+        model = model.mean("month")
+    if "month" in reference.dims:
+        reference = reference.mean("month")
+    model, reference = xr.align(model, reference, join="inner")
+    valid = model.notnull() & reference.notnull()
+    count = valid.sum(dim)
+    model_anomaly = model.where(valid) - model.where(valid).mean(dim)
+    reference_anomaly = reference.where(valid) - reference.where(valid).mean(dim)
+    model_std = np.sqrt((model_anomaly**2).sum(dim) / count)
+    reference_std = np.sqrt((reference_anomaly**2).sum(dim) / count)
+    covariance = (model_anomaly * reference_anomaly).sum(dim) / count
+    crmsd = np.sqrt(((model_anomaly - reference_anomaly) ** 2).sum(dim) / count)
+    return xr.Dataset(
+        {
+            "std": model_std / reference_std,
+            "corr": covariance / (model_std * reference_std),
+            "crmsd": crmsd / reference_std,
+            "count": count,
+        }
+    )
 
 
 class TaylorDiagram(object):
@@ -646,6 +2094,31 @@ class TaylorDiagram(object):
 
         return la
 
+    def add_samples(
+        self, stddev, corrcoef, labels=None, edgecolors=None, facecolors=None, **kwargs
+    ):
+        """Add several samples (*stddev*, *corrcoef*) with one plot call,
+        e.g., from taylor_statistics. Each sample gets its own line (for the
+        legend), *labels*, *edgecolors* and *facecolors* are per sample,
+        *kwargs* are propagated to the `Figure.plot` command."""
+
+        stddev = np.atleast_1d(np.asarray(stddev, dtype=float))
+        corrcoef = np.atleast_1d(np.asarray(corrcoef, dtype=float))
+        lines = self.ax.plot(
+            np.arccos(corrcoef)[np.newaxis, :], stddev[np.newaxis, :], **kwargs
+        )
+        for i, line in enumerate(lines):
+            if labels is not None:
+                line.set_label(labels[i])
+            if edgecolors is not None:
+                line.set_markeredgecolor(edgecolors[i])
+            if facecolors is not None:
+                line.set_markerfacecolor(facecolors[i])
+
+        self.samplePoints.extend(lines)
+
+        return lines
+
     def add_grid(self, *args, **kwargs):
         """Add a grid."""
 
@@ -740,3 +2213,174 @@ def check_time(ds, dim="time", tol=None):
         "continuous": continuous,
         "inferred_frequency": inferred_freq,
     }
+
+
+# spacing of time steps in seconds by frequency label
+time_frequencies = {"1hr": 3600, "3hr": 3 * 3600, "6hr": 6 * 3600, "day": 86400}
+
+
+# seconds of the time units in CF units strings
+time_units = {
+    "days": 86400,
+    "day": 86400,
+    "d": 86400,
+    "hours": 3600,
+    "hour": 3600,
+    "h": 3600,
+    "minutes": 60,
+    "minute": 60,
+    "seconds": 1,
+    "second": 1,
+    "s": 1,
+}
+
+# days before each month in calendars with fixed month lengths
+_days_before_month = {
+    "noleap": np.cumsum([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30]),
+    "all_leap": np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30]),
+    "360_day": np.arange(12) * 30,
+}
+_days_before_month["365_day"] = _days_before_month["noleap"]
+_days_before_month["366_day"] = _days_before_month["all_leap"]
+
+
+def _day_numbers(calendar, year, month, day):
+    # day numbers of dates given as integer arrays, relative to a calendar
+    # specific origin (the julian day number for real world calendars)
+    if calendar in _days_before_month:
+        length = {"360_day": 360, "all_leap": 366, "366_day": 366}.get(calendar, 365)
+        return year * length + _days_before_month[calendar][month - 1] + day - 1
+    a = (14 - month) // 12
+    y = year + 4800 - a
+    days = day + (153 * (month + 12 * a - 3) + 2) // 5 + 365 * y + y // 4
+    gregorian = days - y // 100 + y // 400 - 32045
+    julian = days - 32083
+    if calendar == "julian":
+        return julian
+    if calendar == "proleptic_gregorian":
+        return gregorian
+    # standard calendar, gregorian from 1582-10-15
+    reform = (year * 10000 + month * 100 + day) >= 15821015
+    return np.where(reform, gregorian, julian)
+
+
+def _time_offsets(time):
+    # calendar and integer seconds of a time axis, relative to a calendar
+    # specific origin, computed with array operations from the raw values
+    # (decode_times=False) or the date fields of cftime objects
+    times = np.asarray(time.values).ravel()
+    if times.dtype.kind == "M":
+        seconds = times.astype("datetime64[s]").astype("int64")
+        return "proleptic_gregorian", seconds
+    if not times.size:
+        return None, np.array([], dtype="int64")
+    if times.dtype.kind in "iuf":
+        calendar = time.attrs.get("calendar", "standard").lower()
+        calendar = {"gregorian": "standard"}.get(calendar, calendar)
+        unit, _, reference = time.attrs["units"].partition(" since ")
+        reference = np.array([cftime.num2date(0, f"days since {reference}", calendar)])
+        _, origin = _time_offsets(xr.DataArray(reference))
+        seconds = np.round(times * time_units[unit.strip().lower()]).astype("int64")
+        return calendar, seconds + origin[0]
+    calendar = times[0].calendar
+    fields = {
+        name: np.fromiter(map(attrgetter(name), times), "int64", times.size)
+        for name in ["year", "month", "day", "hour", "minute", "second"]
+    }
+    days = _day_numbers(calendar, fields["year"], fields["month"], fields["day"])
+    seconds = fields["hour"] * 3600 + fields["minute"] * 60 + fields["second"]
+    return calendar, days * 86400 + seconds
+
+
+def validate_time(dsets, dim="time"):
+    """
+    Validates the time axes of several datasets at once.
+
+    Times are encoded as integer seconds for each calendar and all datasets
+    are checked together on the concatenated offsets: monotonicity,
+    duplicates, gaps and the frequency (1hr, 3hr, 6hr, day, mon or year,
+    derived from the median step). Monthly and yearly steps may vary within
+    the month and year lengths of the calendar. Time axes opened with
+    decode_times=False are encoded from their raw values and units.
+
+    Parameters:
+    - dsets: dict of xarray.Dataset (e.g., from open_datasets)
+    - dim: name of the time dimension (default 'time')
+
+    Returns:
+    - pandas.DataFrame with one row per dataset and the columns calendar,
+      start, end, steps, frequency, monotonic, duplicates, gaps, irregular
+      and continuous
+    """
+    times_by_id = {
+        dset_id: np.asarray(ds[dim].values).ravel()
+        for dset_id, ds in dsets.items()
+        if dim in ds.coords
+    }
+    ids = list(times_by_id)
+    offsets = [_time_offsets(dsets[i][dim]) for i in ids]
+    calendars = {i: calendar for i, (calendar, _) in zip(ids, offsets)}
+    steps = np.array([times_by_id[i].size for i in ids], dtype="int64")
+    encoded = np.concatenate([o for _, o in offsets] + [np.array([], "int64")])
+    # differences within each dataset, labelled by the position of the dataset
+    segment = np.repeat(np.arange(len(ids)), steps)
+    diffs = np.diff(encoded)
+    inside = segment[1:] == segment[:-1]
+    diffs, segment = diffs[inside], segment[1:][inside]
+    ndiffs = np.bincount(segment, minlength=len(ids))
+
+    # median step of each dataset
+    order = np.lexsort((diffs, segment))
+    first = np.concatenate([[0], np.cumsum(ndiffs)[:-1]])
+    median = np.zeros(len(ids), dtype="int64")
+    has_steps = ndiffs > 0
+    median[has_steps] = diffs[order][(first + ndiffs // 2)[has_steps]]
+
+    day = 86400
+    is_360 = np.array([calendars[i] == "360_day" for i in ids], dtype=bool)
+    is_noleap = np.array(
+        [calendars[i] in ("noleap", "365_day") for i in ids], dtype=bool
+    )
+    monthly = (median >= 28 * day) & (median <= 31 * day)
+    yearly = (median >= 360 * day) & (median <= 366 * day)
+    frequency = np.full(len(ids), None, dtype=object)
+    for label, seconds in time_frequencies.items():
+        frequency[median == seconds] = label
+    frequency[monthly] = "mon"
+    frequency[yearly] = "year"
+    # allowed range of steps by frequency and calendar
+    lower = median.copy()
+    upper = median.copy()
+    lower[monthly] = np.where(is_360, 30, 28)[monthly] * day
+    upper[monthly] = np.where(is_360, 30, 31)[monthly] * day
+    lower[yearly] = np.where(is_360, 360, 365)[yearly] * day
+    upper[yearly] = np.select([is_360, is_noleap], [360, 365], 366)[yearly] * day
+
+    def count(flag):
+        return np.bincount(segment[flag], minlength=len(ids))
+
+    backwards = count(diffs < 0)
+    duplicates = count(diffs == 0)
+    gaps = count(diffs > upper[segment])
+    irregular = count((diffs > 0) & (diffs < lower[segment]))
+    report = pd.DataFrame(
+        {
+            "calendar": [calendars[i] for i in ids],
+            "start": [str(t[0]) if t.size else None for t in times_by_id.values()],
+            "end": [str(t[-1]) if t.size else None for t in times_by_id.values()],
+            "steps": steps,
+            "frequency": frequency,
+            "monotonic": (backwards == 0) & (duplicates == 0),
+            "duplicates": duplicates,
+            "gaps": gaps,
+            "irregular": irregular,
+        },
+        index=pd.Index(ids, name="dset_id"),
+    )
+    report["continuous"] = (
+        report["monotonic"]
+        & (gaps == 0)
+        & (irregular == 0)
+        & report["frequency"].notnull()
+    )
+    return report